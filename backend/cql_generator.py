@@ -6,14 +6,26 @@ files from CQL schema files using the nb5.jar utility.
 """
 
 import os
-import uuid
+import secrets
+import contextlib
+import asyncio
+import hashlib
+import mmap
 import shutil
+import socket
 import subprocess
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import re
+import threading
+import functools
+import time
+from collections import deque
 from pathlib import Path
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 # Configure logging
 logging.basicConfig(
@@ -28,12 +40,296 @@ NB5_JAR_URL = (
     "https://github.com/nosqlbench/nosqlbench/releases/"
     "latest/download/nb5.jar"
 )
-BASE_DIR = Path(os.path.dirname(os.path.abspath(__file__)))
+BASE_DIR = Path(__file__).resolve().parent
 SESSIONS_DIR = BASE_DIR / "sessions"
 NB5_JAR_PATH = BASE_DIR / "nb5.jar"
+NB5_JAR_PART_PATH = NB5_JAR_PATH.with_suffix(".jar.part")
 
-# Create sessions directory if it doesn't exist
-SESSIONS_DIR.mkdir(exist_ok=True)
+# ETag of the downloaded nb5.jar, used to check "latest" for a new
+# release when CQLGEN_CHECK_UPDATES=1
+NB5_ETAG_PATH = NB5_JAR_PATH.with_suffix(".etag")
+CHECK_UPDATES = os.environ.get("CQLGEN_CHECK_UPDATES") == "1"
+
+# Class-data sharing archive generated from nb5.jar to speed up JVM startup
+NB5_CDS_ARCHIVE = BASE_DIR / "nb5.jsa"
+
+# SHA-256 of nb5.jar recorded at download time, re-checked at startup
+NB5_SHA256_PATH = NB5_JAR_PATH.with_suffix(".sha256")
+
+# Optional pinned SHA-256 digest the downloaded nb5.jar must match
+NB5_JAR_SHA256 = os.environ.get("NB5_JAR_SHA256")
+DOWNLOAD_CHUNK_SIZE = 16 << 20
+
+# Shared HTTP session so downloads reuse connections and retry on
+# transient gateway errors
+_HTTP = requests.Session()
+_HTTP.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=5, backoff_factor=0.3, status_forcelist=[502, 503, 504]
+    )
+))
+
+JAVA_UNAVAILABLE_MSG = (
+    "Java 17+ is not available. Please install Java 17 "
+    "or newer and try again."
+)
+
+# Serializes the nb5.jar download between threads of this process
+_JAR_LOCK = threading.Lock()
+# Locked with flock() so that only one process (e.g. one of several
+# uvicorn workers) downloads nb5.jar or dumps its CDS archive at a time
+NB5_LOCK_PATH = NB5_JAR_PATH.with_suffix(".lock")
+
+# Main class run inside a Nailgun server when CQLGEN_NAILGUN=1, and the
+# port that server listens on (a DSBulk server takes Nailgun's 2113)
+NB5_MAIN_CLASS = "io.nosqlbench.engine.cli.NBCLI"
+NAILGUN_SERVER_CLASS = "com.facebook.nailgun.NGServer"
+NAILGUN_PORT = os.environ.get("CQLGEN_NAILGUN_PORT", "2114")
+# How long a new Nailgun server gets to start listening
+NAILGUN_START_TIMEOUT_SECONDS = 30
+
+# cqlgen runs one at a time inside the shared Nailgun JVM
+_NAILGUN_LOCK = threading.Lock()
+
+# Only the tail of nb5's error output is kept (16 x 4 KiB = 64 KiB)
+STDERR_TAIL_CHUNKS = 16
+STDERR_CHUNK_SIZE = 4096
+
+# Contents of the default cqlgen.conf used when none is supplied
+_DEFAULT_CONF = (
+    "# Default cqlgen.conf\n"
+    "# This file contains default configuration for CQL Generator\n\n"
+    "# Example configuration options might be added here\n"
+)
+DEFAULT_CONF_PATH = BASE_DIR / "default_cqlgen.conf"
+
+# How long a session directory is kept before it is removed
+SESSION_TTL_SECONDS = 3600
+
+# Patterns for parsing `java --version` output
+# Matches `openjdk version "17.0.2"`, `java version "1.8.0"` and the
+# `openjdk 21.0.1` / `java 21` style used by newer releases
+_VER_RE = re.compile(r'(?:openjdk|java)(?:\s+version)?\s+"?(\d+)')
+
+# Whether directories can be removed relative to an open descriptor
+_RMTREE_USES_FD = (
+    {os.open, os.unlink, os.rmdir} <= os.supports_dir_fd
+    and os.scandir in os.supports_fd
+)
+
+
+def _fast_rmtree(path: Path) -> None:
+    """
+    Remove a directory tree, unlinking entries relative to an open
+    descriptor for each directory instead of resolving full paths.
+
+    Falls back to shutil.rmtree on platforms without dir_fd support.
+
+    Args:
+        path (Path): The directory to remove.
+    """
+    if not _RMTREE_USES_FD:
+        shutil.rmtree(path)
+        return
+
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        _rmtree_fd(fd)
+    finally:
+        os.close(fd)
+    os.rmdir(path)
+
+
+def _rmtree_fd(dir_fd: int) -> None:
+    """
+    Remove everything inside the directory open as dir_fd.
+
+    Args:
+        dir_fd (int): Descriptor of the directory to empty.
+    """
+    with os.scandir(dir_fd) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                sub_fd = os.open(
+                    entry.name, os.O_RDONLY | os.O_DIRECTORY, dir_fd=dir_fd
+                )
+                try:
+                    _rmtree_fd(sub_fd)
+                finally:
+                    os.close(sub_fd)
+                os.rmdir(entry.name, dir_fd=dir_fd)
+            else:
+                os.unlink(entry.name, dir_fd=dir_fd)
+
+
+def _sha256_file(path: Path) -> str:
+    """
+    Hash a file by mapping it into memory instead of reading it in chunks.
+
+    Args:
+        path (Path): File to hash.
+
+    Returns:
+        str: Hex SHA-256 digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                digest.update(m)
+    return digest.hexdigest()
+
+
+def _preallocate(f, offset: int, length: int) -> None:
+    """
+    Reserve disk space for a download that is about to be written.
+
+    Failures are ignored: preallocation is only a layout hint.
+
+    Args:
+        f: File object opened for writing.
+        offset (int): Position the download starts writing at.
+        length (int): Number of bytes expected.
+    """
+    if length <= 0 or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(f.fileno(), offset, length)
+    except OSError:
+        pass
+
+
+def _absolute(path: str, cwd: str) -> str:
+    """
+    Make a path absolute against cwd without building a Path object.
+
+    Args:
+        path (str): The path to resolve.
+        cwd (str): The current working directory.
+
+    Returns:
+        str: The absolute path.
+    """
+    return path if os.path.isabs(path) else os.path.join(cwd, path)
+
+
+@contextlib.contextmanager
+def _nb5_files_lock():
+    """
+    Hold an exclusive lock on NB5_LOCK_PATH, shared by every process
+    using this directory. Without fcntl (Windows) nothing is locked.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(NB5_LOCK_PATH, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _port_open(port: int) -> bool:
+    """
+    Check whether something accepts connections on a loopback port.
+
+    Args:
+        port (int): The port to try.
+
+    Returns:
+        bool: True if a connection could be made.
+    """
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def _wait_for_port(
+    process: subprocess.Popen, port: int, timeout: float
+) -> bool:
+    """
+    Wait until a server process accepts connections on a loopback port.
+
+    Args:
+        process (subprocess.Popen): The server; waiting stops if it exits.
+        port (int): The port it listens on.
+        timeout (float): Seconds to wait at most.
+
+    Returns:
+        bool: True once the port accepts a connection.
+    """
+    deadline = time.monotonic() + timeout
+    while process.poll() is None and time.monotonic() < deadline:
+        if _port_open(port):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+@functools.cache
+def _get_shared_default_conf() -> Path:
+    """
+    Write the default cqlgen.conf shared by all sessions, once per process.
+
+    The file is written to a temporary name and moved into place so a
+    concurrent reader never sees a partial file.
+
+    Returns:
+        Path: Path to the shared default conf file.
+    """
+    tmp_path = DEFAULT_CONF_PATH.with_name(
+        f"{DEFAULT_CONF_PATH.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    tmp_path.write_text(_DEFAULT_CONF)
+    os.replace(tmp_path, DEFAULT_CONF_PATH)
+    logger.info("Created default conf file: %s", DEFAULT_CONF_PATH)
+    return DEFAULT_CONF_PATH
+
+
+@functools.lru_cache(maxsize=1)
+def _java_available() -> bool:
+    """
+    Run `java --version` once and check for version 17 or higher.
+
+    Returns:
+        bool: True if suitable Java version available, False otherwise.
+    """
+    try:
+        result = subprocess.run(
+            ["java", "--version"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.error("Error checking Java version: %s", e)
+        return False
+
+    version_output = result.stdout
+    version_match = _VER_RE.search(version_output)
+    if not version_match:
+        logger.warning(
+            "Could not determine Java version from: %s",
+            version_output.strip()
+        )
+        # Default to accepting the Java version if we can't determine
+        # it but it exists and ran correctly
+        return True
+
+    java_version = int(version_match.group(1))
+    logger.info("Found Java version: %s", java_version)
+    if java_version >= 17:
+        logger.info("Java %s is suitable (17+ required)", java_version)
+        return True
+    logger.warning("Java version %s is too old, 17+ required", java_version)
+    return False
 
 
 class CQLGenerator:
@@ -41,140 +337,347 @@ class CQLGenerator:
     Main class for handling CQL to YAML generation process.
     """
 
+    # Set once the sessions directory has been created in this process
+    _initialized = False
+    # Set once nb5.jar is known to be present in this process
+    _jar_ready = False
+
     def __init__(self):
         """Initialize the CQL Generator."""
-        self._check_nb5_jar()
+        if not CQLGenerator._initialized:
+            SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
+            CQLGenerator._initialized = True
+        self._cds_archive: Optional[Path] = None
+        # Dispatch cqlgen runs to a warm JVM through Nailgun's `ng` client
+        self._use_nailgun = os.environ.get("CQLGEN_NAILGUN") == "1"
+        self._nailgun_server: Optional[subprocess.Popen] = None
+        # Set once runs go through a listening Nailgun server, whether
+        # started here or by another process
+        self._nailgun_ready = False
+        with _nb5_files_lock():
+            self._check_nb5_jar()
+            self._check_cds_archive()
 
     def _check_nb5_jar(self) -> None:
         """
         Check if nb5.jar exists, download if not present.
         """
-        if not NB5_JAR_PATH.exists():
-            logger.info("nb5.jar not found, downloading...")
+        if CQLGenerator._jar_ready:
+            return
+        with _JAR_LOCK:
+            # Another thread may have finished the download meanwhile
+            if CQLGenerator._jar_ready:
+                return
+            if not NB5_JAR_PATH.exists() or not self._nb5_jar_intact() or (
+                CHECK_UPDATES and self._nb5_jar_outdated()
+            ):
+                logger.info("nb5.jar not found or outdated, downloading...")
+                try:
+                    self._download_nb5_jar()
+                    logger.info("nb5.jar downloaded to %s", NB5_JAR_PATH)
+                except requests.RequestException as e:
+                    logger.error("Failed to download nb5.jar: %s", e)
+                    raise RuntimeError(f"Failed to download nb5.jar: {e}")
+            else:
+                logger.info("nb5.jar already exists at %s", NB5_JAR_PATH)
+            CQLGenerator._jar_ready = True
+
+    def _nb5_jar_intact(self) -> bool:
+        """
+        Compare nb5.jar against the digest recorded when it was downloaded.
+
+        Returns:
+            bool: False if the jar no longer matches; True if it matches
+                or no digest was recorded.
+        """
+        try:
+            expected = NB5_SHA256_PATH.read_text().strip()
+        except OSError:
+            return True
+        if _sha256_file(NB5_JAR_PATH) == expected:
+            return True
+        logger.warning("nb5.jar does not match its recorded SHA-256")
+        return False
+
+    def _nb5_jar_outdated(self) -> bool:
+        """
+        Ask the release server whether nb5.jar has changed since it was
+        downloaded, using the stored ETag in a conditional HEAD request.
+
+        Returns:
+            bool: True if a newer jar is available. Network errors count
+                as up to date so offline installs keep working.
+        """
+        try:
+            saved_etag = NB5_ETAG_PATH.read_text().strip()
+        except OSError:
+            saved_etag = ""
+        if not saved_etag:
+            # Nothing to compare against; keep the jar we have
+            return False
+
+        try:
+            response = _HTTP.head(
+                NB5_JAR_URL,
+                allow_redirects=True,
+                headers={"If-None-Match": saved_etag},
+                timeout=(5, 30)
+            )
+        except requests.RequestException as e:
+            logger.warning("Could not check for a newer nb5.jar: %s", e)
+            return False
+
+        if response.status_code == 304:
+            return False
+        if response.ok and response.headers.get("ETag") != saved_etag:
+            logger.info("A newer nb5.jar is available")
+            # Drop any partial download of the previous release
             try:
-                response = requests.get(NB5_JAR_URL, stream=True)
-                response.raise_for_status()
-                with open(NB5_JAR_PATH, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                logger.info(f"nb5.jar downloaded to {NB5_JAR_PATH}")
-            except requests.RequestException as e:
-                logger.error(f"Failed to download nb5.jar: {e}")
-                raise RuntimeError(f"Failed to download nb5.jar: {e}")
-        else:
-            logger.info(f"nb5.jar already exists at {NB5_JAR_PATH}")
+                NB5_JAR_PART_PATH.unlink()
+            except FileNotFoundError:
+                pass
+            return True
+        return False
+
+    def _download_nb5_jar(self) -> None:
+        """
+        Download nb5.jar into a .part file, resuming a previous partial
+        download when possible, and move it into place once complete.
+
+        Raises:
+            requests.RequestException: If the download fails.
+            RuntimeError: If the jar does not match NB5_JAR_SHA256.
+        """
+        offset = (
+            NB5_JAR_PART_PATH.stat().st_size
+            if NB5_JAR_PART_PATH.exists() else 0
+        )
+        headers = {"Range": f"bytes={offset}-"} if offset > 0 else {}
+
+        response = _HTTP.get(
+            NB5_JAR_URL, stream=True, headers=headers, timeout=(5, 30)
+        )
+        if response.status_code == 416:
+            # The partial file cannot be resumed, start over
+            response.close()
+            NB5_JAR_PART_PATH.unlink()
+            response = _HTTP.get(NB5_JAR_URL, stream=True, timeout=(5, 30))
+        response.raise_for_status()
+
+        # A server that ignores the Range header sends the whole file
+        mode = 'ab' if response.status_code == 206 else 'wb'
+        if mode == 'ab':
+            logger.info("Resuming nb5.jar download at byte %s", offset)
+        # Copy straight from the socket in large blocks instead of
+        # looping over small iter_content chunks
+        response.raw.decode_content = True
+        with response, open(NB5_JAR_PART_PATH, mode) as f:
+            start = f.tell()
+            if "Content-Encoding" not in response.headers:
+                _preallocate(
+                    f, start,
+                    int(response.headers.get("Content-Length", 0))
+                )
+            shutil.copyfileobj(response.raw, f, DOWNLOAD_CHUNK_SIZE)
+            # Drop any reserved space the body did not fill
+            f.truncate(f.tell())
+
+        digest = _sha256_file(NB5_JAR_PART_PATH)
+        if NB5_JAR_SHA256 and digest != NB5_JAR_SHA256.lower():
+            NB5_JAR_PART_PATH.unlink()
+            raise RuntimeError(
+                "Downloaded nb5.jar does not match NB5_JAR_SHA256"
+            )
+
+        os.replace(NB5_JAR_PART_PATH, NB5_JAR_PATH)
+        NB5_SHA256_PATH.write_text(digest)
+
+        etag = response.headers.get("ETag")
+        if etag:
+            NB5_ETAG_PATH.write_text(etag)
+
+        # An archive dumped from a previous jar would no longer match
+        try:
+            NB5_CDS_ARCHIVE.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _check_cds_archive(self) -> None:
+        """
+        Check if the nb5 class-data sharing archive exists, and create it
+        if not present.
+
+        The archive lets the JVM map pre-parsed classes instead of loading
+        them from the jar on every cqlgen run. Failing to create it is not
+        an error; cqlgen then simply runs without it.
+        """
+        if not NB5_CDS_ARCHIVE.exists():
+            logger.info("Creating nb5 class-data sharing archive...")
+            try:
+                subprocess.run(
+                    [
+                        "java", "--enable-preview",
+                        f"-XX:ArchiveClassesAtExit={NB5_CDS_ARCHIVE}",
+                        "-jar", str(NB5_JAR_PATH), "cqlgen", "--help"
+                    ],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=120,
+                    check=False
+                )
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.warning("Could not create nb5 CDS archive: %s", e)
+
+        if NB5_CDS_ARCHIVE.exists():
+            self._cds_archive = NB5_CDS_ARCHIVE
+
+    def start_nailgun_server(self) -> bool:
+        """
+        Start a Nailgun server with nb5 on its classpath, if Nailgun
+        dispatch is enabled (CQLGEN_NAILGUN=1).
+
+        The server jar is taken from NAILGUN_SERVER_JAR and the `ng`
+        client must be on PATH. The JVM, nb5's loaded classes and JIT
+        state are then reused by every cqlgen run instead of paying JVM
+        startup each time. A server already listening on NAILGUN_PORT,
+        such as the one cqlgen_app starts before its workers, is used
+        instead of starting another.
+
+        Returns:
+            bool: True if cqlgen runs will be dispatched through Nailgun.
+        """
+        if not self._use_nailgun or self._nailgun_ready:
+            return self._nailgun_ready
+        server_jar = os.environ.get("NAILGUN_SERVER_JAR")
+        if not server_jar or shutil.which("ng") is None:
+            logger.warning(
+                "CQLGEN_NAILGUN=1 needs NAILGUN_SERVER_JAR and the ng "
+                "client; running nb5 directly"
+            )
+            self._use_nailgun = False
+            return False
+        if _port_open(int(NAILGUN_PORT)):
+            logger.info("Using the Nailgun server on port %s", NAILGUN_PORT)
+            self._nailgun_ready = True
+            return True
+
+        classpath = os.pathsep.join([str(NB5_JAR_PATH), server_jar])
+        # Nailgun turns System.exit() into the end of one run through a
+        # security manager, which Java 18+ only installs when allowed
+        server = subprocess.Popen(
+            ["java", "--enable-preview", "-Djava.security.manager=allow",
+             "-cp", classpath, NAILGUN_SERVER_CLASS,
+             f"127.0.0.1:{NAILGUN_PORT}"],
+            stdout=subprocess.DEVNULL
+        )
+        # Runs only go through `ng` once the server is listening
+        if not _wait_for_port(
+            server, int(NAILGUN_PORT), NAILGUN_START_TIMEOUT_SECONDS
+        ):
+            logger.warning(
+                "Nailgun server for nb5 did not start listening on port "
+                "%s; running nb5 directly", NAILGUN_PORT
+            )
+            server.kill()
+            server.wait()
+            self._use_nailgun = False
+            return False
+        self._nailgun_server = server
+        self._nailgun_ready = True
+        logger.info(
+            "Started Nailgun server for nb5 (pid %s, port %s)",
+            server.pid, NAILGUN_PORT
+        )
+        return True
+
+    def stop_nailgun_server(self) -> None:
+        """
+        Stop dispatching through Nailgun, and stop the server if
+        start_nailgun_server started it.
+        """
+        self._nailgun_ready = False
+        if self._nailgun_server is not None:
+            self._nailgun_server.terminate()
+            self._nailgun_server.wait()
+            self._nailgun_server = None
 
     def _verify_java_version(self) -> bool:
         """
         Verify that Java is installed (version 17 or higher).
 
+        The check runs once per process, and is skipped entirely when
+        BENCHFLOW_SKIP_JAVA_CHECK=1.
+
         Returns:
             bool: True if suitable Java version available, False otherwise.
         """
-        try:
-            result = subprocess.run(
-                ["java", "--version"],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            version_output = result.stdout
-
-            # Extract the Java version using regex
-            version_match = re.search(r'version\s+"?(\d+)\.', version_output)
-            if version_match:
-                java_version = int(version_match.group(1))
-                logger.info(f"Found Java version: {java_version}")
-
-                # Accept Java 17 or higher
-                if java_version >= 17:
-                    logger.info(
-                        f"Java {java_version} is suitable (17+ required)"
-                    )
-                    return True
-                else:
-                    logger.warning(
-                        f"Java version {java_version} is too old, "
-                        "17+ required"
-                    )
-                    return False
-            else:
-                # Alternative pattern for newer Java releases
-                alt_match = re.search(r'java\s+(\d+)', version_output)
-                if alt_match:
-                    java_version = int(alt_match.group(1))
-                    logger.info(f"Found Java version: {java_version}")
-
-                    if java_version >= 17:
-                        logger.info(
-                            f"Java {java_version} is suitable "
-                            "(17+ required)"
-                        )
-                        return True
-                    else:
-                        logger.warning(
-                            f"Java version {java_version} is too old, "
-                            "17+ required"
-                        )
-                        return False
-                else:
-                    logger.warning(
-                        f"Could not determine Java version from: "
-                        f"{version_output.strip()}"
-                    )
-                    # Default to accepting the Java version if we can't
-                    # determine it but it exists and ran correctly
-                    return True
-        except subprocess.SubprocessError as e:
-            logger.error(f"Error checking Java version: {e}")
-            return False
+        if os.environ.get("BENCHFLOW_SKIP_JAVA_CHECK") == "1":
+            return True
+        return _java_available()
 
     def create_session(self) -> str:
         """
-        Create a new session directory and copy nb5.jar to it.
+        Create a new session directory.
+
+        nb5 is run from the shared NB5_JAR_PATH, so nothing is copied or
+        linked into the session.
 
         Returns:
             str: The session ID.
         """
-        session_id = str(uuid.uuid4())
+        session_id = secrets.token_urlsafe(12)
         session_dir = SESSIONS_DIR / session_id
-        session_dir.mkdir(exist_ok=True)
-
-        # Copy nb5.jar to session directory
-        session_nb5_jar = session_dir / "nb5.jar"
-        shutil.copy(NB5_JAR_PATH, session_nb5_jar)
-        logger.info(f"Created session: {session_id}")
-        logger.info(f"Copied nb5.jar to session directory: {session_dir}")
+        session_dir.mkdir()
+        logger.info("Created session: %s", session_id)
 
         return session_id
 
-    def _create_default_conf_file(self, session_dir: Path) -> Path:
+    def process_files(
+        self,
+        schema_file: str,
+        output_file: str,
+        conf_file: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> Tuple[bool, str, Optional[Path]]:
         """
-        Create a default cqlgen.conf file in the session directory.
+        Process CQL schema file to generate YAML.
 
         Args:
-            session_dir (Path): Path to the session directory.
+            schema_file (str): Path to the schema.cql file.
+            output_file (str): Name for the output YAML file.
+            conf_file (Optional[str]): Path to configuration file, or
+                None to use a default.
+            session_id (Optional[str]): Session ID, or None to create
+                a new session.
 
         Returns:
-            Path: Path to the created conf file.
+            Tuple[bool, str, Optional[Path]]: Success status, message,
+                and path to output file.
         """
-        conf_path = session_dir / "cqlgen.conf"
+        # Verify Java is available (version 17+)
+        if not self._verify_java_version():
+            return False, JAVA_UNAVAILABLE_MSG, None
 
-        # Create a minimal default conf
-        with open(conf_path, "w") as f:
-            f.write("# Default cqlgen.conf\n")
-            f.write(
-                "# This file contains default configuration "
-                "for CQL Generator\n\n"
-            )
-            f.write(
-                "# Example configuration options might be added here\n"
+        # Create or use existing session
+        if session_id is None:
+            session_id = self.create_session()
+
+        session_dir = SESSIONS_DIR / session_id
+        logger.info("Processing files in session directory: %s", session_dir)
+
+        try:
+            cmd, output_path = self._prepare_cqlgen(
+                schema_file, output_file, conf_file, session_dir
             )
+            returncode, stderr = self._run_cqlgen(cmd, session_dir)
+            return self._cqlgen_result(returncode, stderr, output_path)
 
-        logger.info(f"Created default conf file: {conf_path}")
-        return conf_path
+        except Exception as e:
+            error_msg = f"Error processing files: {str(e)}"
+            logger.error(error_msg)
+            return False, error_msg, None
 
-    def process_files(
+    async def process_files_async(
         self,
         schema_file: str,
         output_file: str,
@@ -182,7 +685,11 @@ class CQLGenerator:
         session_id: Optional[str] = None
     ) -> Tuple[bool, str, Optional[Path]]:
         """
-        Process CQL schema file to generate YAML.
+        Process CQL schema file to generate YAML without blocking the
+        event loop.
+
+        Behaves like process_files, but nb5 runs as an asyncio subprocess
+        and the file system work is done in a worker thread.
 
         Args:
             schema_file (str): Path to the schema.cql file.
@@ -197,116 +704,348 @@ class CQLGenerator:
                 and path to output file.
         """
         # Verify Java is available (version 17+)
-        if not self._verify_java_version():
-            return (
-                False,
-                "Java 17+ is not available. Please install Java 17 "
-                "or newer and try again.",
-                None
-            )
+        if not await asyncio.to_thread(self._verify_java_version):
+            return False, JAVA_UNAVAILABLE_MSG, None
 
         # Create or use existing session
         if session_id is None:
-            session_id = self.create_session()
+            session_id = await asyncio.to_thread(self.create_session)
 
         session_dir = SESSIONS_DIR / session_id
-        logger.info(f"Processing files in session directory: {session_dir}")
+        logger.info("Processing files in session directory: %s", session_dir)
 
         try:
-            # Make sure nb5.jar is copied to the session directory
-            session_nb5_jar = session_dir / "nb5.jar"
-            if not session_nb5_jar.exists():
-                shutil.copy(NB5_JAR_PATH, session_nb5_jar)
-                logger.info(
-                    f"Copied nb5.jar to session directory: {session_dir}"
-                )
+            cmd, output_path = await asyncio.to_thread(
+                self._prepare_cqlgen,
+                schema_file, output_file, conf_file, session_dir
+            )
+            returncode, stderr = await self._run_cqlgen_async(
+                cmd, session_dir
+            )
+            return self._cqlgen_result(returncode, stderr, output_path)
+
+        except Exception as e:
+            error_msg = f"Error processing files: {str(e)}"
+            logger.error(error_msg)
+            return False, error_msg, None
 
-            # Set up paths for schema and output
-            # Make sure to use absolute paths
-            schema_path = Path(schema_file).absolute()
-            output_path = session_dir / output_file
+    def _prepare_cqlgen(
+        self,
+        schema_file: str,
+        output_file: str,
+        conf_file: Optional[str],
+        session_dir: Path
+    ) -> Tuple[List[str], Path]:
+        """
+        Resolve the input paths and build the cqlgen command for a run.
 
-            # Determine the conf file to use
-            conf_path = None
-            if conf_file:
-                conf_path = Path(conf_file).absolute()
-                logger.info(f"Using provided conf file: {conf_path}")
-            else:
-                # Create a default conf file in session directory
-                conf_path = self._create_default_conf_file(session_dir)
-                logger.info(f"Using default conf file: {conf_path}")
+        Args:
+            schema_file (str): Path to the schema.cql file.
+            output_file (str): Name for the output YAML file.
+            conf_file (Optional[str]): Path to configuration file, or
+                None to use the shared default.
+            session_dir (Path): Path to the session directory.
 
-            # Change to the session directory before running command
-            original_dir = os.getcwd()
-            os.chdir(str(session_dir))
+        Returns:
+            Tuple[List[str], Path]: The command arguments and the path
+                the output file will be written to.
+        """
+        # Set up paths for schema and output
+        # Make sure to use absolute paths
+        cwd = os.getcwd()
+        schema_path = _absolute(schema_file, cwd)
+        output_path = session_dir / output_file
+
+        # Determine the conf file to use
+        if conf_file:
+            conf_path = _absolute(conf_file, cwd)
+            logger.info("Using provided conf file: %s", conf_path)
+        else:
+            conf_path = str(_get_shared_default_conf())
+            logger.info("Using default conf file: %s", conf_path)
+
+        # Run the shared nb5.jar from the session directory
+        cmd = self._build_cqlgen_command(
+            schema_path, output_file, conf_path, session_dir
+        )
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Running command from directory %s: %s",
+                session_dir, ' '.join(cmd)
+            )
+        return cmd, output_path
+
+    def process_files_batch(
+        self,
+        jobs: List[Tuple[str, str, Optional[str]]],
+        session_id: Optional[str] = None
+    ) -> List[Tuple[bool, str, Optional[Path]]]:
+        """
+        Process several CQL schema files in a single session.
+
+        nb5's cqlgen app takes over the whole command line, so one JVM
+        cannot run several jobs. Instead the Java check, the session and
+        the default conf file are shared, and the JVMs run concurrently.
+
+        Args:
+            jobs (List[Tuple[str, str, Optional[str]]]): Tuples of
+                (schema_file, output_file, conf_file); conf_file may be
+                None to use a default.
+            session_id (Optional[str]): Session ID, or None to create
+                a new session.
+
+        Returns:
+            List[Tuple[bool, str, Optional[Path]]]: Success status,
+                message, and path to output file for each job, in order.
+        """
+        if not jobs:
+            return []
+
+        if not self._verify_java_version():
+            return [(False, JAVA_UNAVAILABLE_MSG, None)] * len(jobs)
+
+        if session_id is None:
+            session_id = self.create_session()
 
+        session_dir = SESSIONS_DIR / session_id
+        logger.info(
+            "Processing %s jobs in session directory: %s",
+            len(jobs), session_dir
+        )
+
+        cwd = os.getcwd()
+        default_conf = None
+        if any(conf_file is None for _, _, conf_file in jobs):
+            default_conf = str(_get_shared_default_conf())
+
+        def run_job(
+            job: Tuple[str, str, Optional[str]]
+        ) -> Tuple[bool, str, Optional[Path]]:
+            schema_file, output_file, conf_file = job
             try:
-                # Run nb5.jar from the session directory
-                # Use relative path for jar file since we're in
-                # session directory
-                cmd = [
-                    "java", "--enable-preview", "-jar",
-                    "nb5.jar",  # Relative path as we're in session dir
-                    "cqlgen", str(schema_path), str(output_file),
-                    "--conf", str(conf_path),
-                    "--show-stacktraces"
-                ]
-
-                logger.info(
-                    f"Running command from directory {os.getcwd()}: "
-                    f"{' '.join(cmd)}"
+                conf_path = (
+                    _absolute(conf_file, cwd) if conf_file
+                    else default_conf
                 )
-
-                process = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    check=False  # Don't raise exception on non-zero exit
+                cmd = self._build_cqlgen_command(
+                    _absolute(schema_file, cwd), output_file, conf_path,
+                    session_dir
                 )
-            finally:
-                # Always change back to the original directory
-                os.chdir(original_dir)
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Running command: %s", ' '.join(cmd))
 
-            if process.returncode != 0:
-                error_msg = f"Error generating YAML: {process.stderr}"
+                returncode, stderr = self._run_cqlgen(cmd, session_dir)
+                return self._cqlgen_result(
+                    returncode, stderr, session_dir / output_file
+                )
+            except Exception as e:
+                error_msg = f"Error processing files: {str(e)}"
                 logger.error(error_msg)
                 return False, error_msg, None
 
-            if not output_path.exists():
-                error_msg = "Output file was not generated"
-                logger.error(error_msg)
-                return False, error_msg, None
+        max_workers = min(len(jobs), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(run_job, jobs))
 
-            logger.info(f"Successfully generated YAML file: {output_path}")
-            return True, "YAML file generated successfully", output_path
+    def _build_cqlgen_command(
+        self,
+        schema_path: str,
+        output_file: str,
+        conf_path: str,
+        session_dir: Path
+    ) -> List[str]:
+        """
+        Build the command line for an nb5 cqlgen run.
 
-        except Exception as e:
-            error_msg = f"Error processing files: {str(e)}"
+        Args:
+            schema_path (str): Absolute path to the schema file.
+            output_file (str): Output file name, relative to the session
+                directory.
+            conf_path (str): Path to the conf file.
+            session_dir (Path): The session directory the run writes to.
+
+        Returns:
+            List[str]: The command arguments.
+        """
+        cqlgen_args = [
+            "cqlgen", schema_path, output_file,
+            "--conf", conf_path,
+            "--show-stacktraces"
+        ]
+        if self._nailgun_ready:
+            # A Nailgun server resolves relative paths against its own
+            # directory, not the session directory
+            cqlgen_args[2] = str(session_dir / output_file)
+            return [
+                "ng", "--nailgun-port", NAILGUN_PORT, NB5_MAIN_CLASS,
+                *cqlgen_args
+            ]
+
+        # cqlgen is short-lived, so favour JVM startup over peak
+        # throughput: C1-only JIT plus class-data sharing
+        cmd = [
+            "java", "--enable-preview",
+            "-XX:TieredStopAtLevel=1", "-Xshare:auto"
+        ]
+        if self._cds_archive:
+            cmd.append(f"-XX:SharedArchiveFile={self._cds_archive}")
+        cmd += ["-jar", str(NB5_JAR_PATH), *cqlgen_args]
+        return cmd
+
+    def _run_cqlgen(
+        self,
+        cmd: List[str],
+        session_dir: Path
+    ) -> Tuple[int, str]:
+        """
+        Run an nb5 cqlgen command from the session directory.
+
+        stdout is discarded and only the last 64 KiB of stderr is kept,
+        so a JVM dumping large stack traces cannot balloon memory.
+
+        Args:
+            cmd (List[str]): The command arguments.
+            session_dir (Path): Directory to run the command in.
+
+        Returns:
+            Tuple[int, str]: Exit status and the tail of stderr.
+        """
+        tail = deque(maxlen=STDERR_TAIL_CHUNKS)
+        lock = (_NAILGUN_LOCK if cmd[0] == "ng"
+                else contextlib.nullcontext())
+        with lock, subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            cwd=str(session_dir)
+        ) as process:
+            for chunk in iter(
+                lambda: process.stderr.read(STDERR_CHUNK_SIZE), b''
+            ):
+                tail.append(chunk)
+            returncode = process.wait()
+
+        return returncode, b''.join(tail).decode('utf-8', errors='replace')
+
+    async def _run_cqlgen_async(
+        self,
+        cmd: List[str],
+        session_dir: Path
+    ) -> Tuple[int, str]:
+        """
+        Run an nb5 cqlgen command as an asyncio subprocess.
+
+        Like _run_cqlgen, stdout is discarded and only the last 64 KiB
+        of stderr is kept.
+
+        Args:
+            cmd (List[str]): The command arguments.
+            session_dir (Path): Directory to run the command in.
+
+        Returns:
+            Tuple[int, str]: Exit status and the tail of stderr.
+        """
+        if cmd[0] == "ng":
+            # Wait for the shared JVM in a worker thread, not the loop
+            return await asyncio.to_thread(self._run_cqlgen, cmd, session_dir)
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=str(session_dir)
+        )
+        tail = deque(maxlen=STDERR_TAIL_CHUNKS)
+        while True:
+            chunk = await process.stderr.read(STDERR_CHUNK_SIZE)
+            if not chunk:
+                break
+            tail.append(chunk)
+        returncode = await process.wait()
+
+        return returncode, b''.join(tail).decode('utf-8', errors='replace')
+
+    def _cqlgen_result(
+        self,
+        returncode: int,
+        stderr: str,
+        output_path: Path
+    ) -> Tuple[bool, str, Optional[Path]]:
+        """
+        Turn the outcome of an nb5 cqlgen run into a result tuple.
+
+        Args:
+            returncode (int): Exit status of the process.
+            stderr (str): Error output of the process.
+            output_path (Path): Where the YAML file should have been
+                written.
+
+        Returns:
+            Tuple[bool, str, Optional[Path]]: Success status, message,
+                and path to output file.
+        """
+        if returncode != 0:
+            error_msg = f"Error generating YAML: {stderr}"
             logger.error(error_msg)
             return False, error_msg, None
 
-    def remove_nb5_jar(self, session_id: str) -> None:
+        if not output_path.exists():
+            error_msg = "Output file was not generated"
+            logger.error(error_msg)
+            return False, error_msg, None
+
+        logger.info("Successfully generated YAML file: %s", output_path)
+        return True, "YAML file generated successfully", output_path
+
+    def sweep_expired_sessions(
+        self, max_age_seconds: int = SESSION_TTL_SECONDS
+    ) -> int:
+        """
+        Remove session directories older than max_age_seconds.
+
+        Run periodically, this is what expires sessions; it also clears
+        sessions left behind by a previous run. The directory type comes
+        from os.scandir's listing; only directories are stat()ed for
+        their mtime.
+
+        Args:
+            max_age_seconds (int): Age after which a session is removed.
+
+        Returns:
+            int: Number of session directories removed.
         """
-        Remove only the nb5.jar file from the session directory.
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        try:
+            entries = list(os.scandir(SESSIONS_DIR))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if (entry.is_dir(follow_symlinks=False) and
+                        entry.stat(follow_symlinks=False).st_mtime < cutoff):
+                    _fast_rmtree(Path(entry.path))
+                    removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error("Error removing session %s: %s", entry.name, e)
+        if removed:
+            logger.info("Removed %s expired session directories", removed)
+        return removed
+
+    def remove_session_directory(self, session_id: str) -> None:
+        """
+        Remove a session directory and everything in it.
 
         Args:
             session_id (str): The session ID.
         """
         session_dir = SESSIONS_DIR / session_id
-        session_nb5_jar = session_dir / "nb5.jar"
-
-        if session_nb5_jar.exists():
-            try:
-                session_nb5_jar.unlink()
-                logger.info(
-                    f"Deleted nb5.jar from session directory: {session_dir}"
-                )
-            except Exception as e:
-                logger.error(
-                    f"Error deleting nb5.jar from session {session_id}: {e}"
-                )
-        else:
-            logger.info(
-                f"nb5.jar not found in session {session_id}, "
-                "nothing to clean up"
-            )
+        try:
+            _fast_rmtree(session_dir)
+            logger.info("Removed session directory: %s", session_dir)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error("Error removing session %s: %s", session_id, e)
@@ -12,17 +12,20 @@ Usage:
 
 import os
 import sys
-import uuid
+import asyncio
 import shutil
-import subprocess
-import requests
+import time
 import logging
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Tuple, Dict, Any
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from typing import Dict, Any, List, NamedTuple, Optional
+from fastapi import FastAPI, File, UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 
+from cql_generator import CQLGenerator, SESSIONS_DIR, SESSION_TTL_SECONDS
+from file_response import ZeroCopyFileResponse
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -31,222 +34,113 @@ logging.basicConfig(
 )
 logger = logging.getLogger("cqlgen")
 
-# Constants
-NB5_JAR_URL = (
-    "https://github.com/nosqlbench/nosqlbench/releases/"
-    "latest/download/nb5.jar"
+# Uploads are copied to disk in blocks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# FastAPI application for API access
+app = FastAPI(
+    title="CQL to YAML Generator API",
+    description="API for generating YAML files from CQL schema files",
+    version="1.0.0"
 )
-BASE_DIR = Path(os.path.dirname(os.path.abspath(__file__)))
-SESSIONS_DIR = BASE_DIR / "sessions"
-NB5_JAR_PATH = BASE_DIR / "nb5.jar"
 
-# Create sessions directory if it doesn't exist
-SESSIONS_DIR.mkdir(exist_ok=True)
+# Shared generator, created once at startup
+_generator: Optional[CQLGenerator] = None
 
+# How often expired sessions are looked for
+SESSION_EVICT_INTERVAL_SECONDS = 60
 
-class CQLGenerator:
-    """
-    Main class for handling CQL to YAML generation process.
-    """
+# Most sessions this process keeps; creating one more removes the least
+# recently used
+MAX_SESSIONS = int(os.environ.get("CQLGEN_MAX_SESSIONS", "1024"))
 
-    def __init__(self):
-        """Initialize the CQL Generator."""
-        self._check_nb5_jar()
-
-    def _check_nb5_jar(self) -> None:
-        """
-        Check if nb5.jar exists, download if not present.
-        """
-        if not NB5_JAR_PATH.exists():
-            logger.info("nb5.jar not found, downloading...")
-            try:
-                response = requests.get(NB5_JAR_URL, stream=True)
-                response.raise_for_status()
-                with open(NB5_JAR_PATH, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                logger.info(f"nb5.jar downloaded to {NB5_JAR_PATH}")
-            except requests.RequestException as e:
-                logger.error(f"Failed to download nb5.jar: {e}")
-                raise RuntimeError(f"Failed to download nb5.jar: {e}")
-        else:
-            logger.info(f"nb5.jar already exists at {NB5_JAR_PATH}")
 
-    def _verify_java_version(self) -> bool:
-        """
-        Verify that Java 23 is installed.
+class SessionRec(NamedTuple):
+    """A session created by this process."""
+    output_path: Optional[Path]
+    created: float
 
-        Returns:
-            bool: True if Java 23 is available, False otherwise.
-        """
-        try:
-            result = subprocess.run(
-                ["java", "--version"],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            version_output = result.stdout
-
-            # Check if Java 23 is in the version string
-            if "23" in version_output:
-                logger.info("Java 23 is available")
-                return True
-            else:
-                logger.warning(
-                    f"Java 23 not found. Found: {version_output.strip()}"
-                )
-                return False
-        except subprocess.SubprocessError as e:
-            logger.error(f"Error checking Java version: {e}")
-            return False
-
-    def create_session(self) -> str:
-        """
-        Create a new session directory and copy nb5.jar to it.
-
-        Returns:
-            str: The session ID.
-        """
-        session_id = str(uuid.uuid4())
-        session_dir = SESSIONS_DIR / session_id
-        session_dir.mkdir(exist_ok=True)
-
-        # Copy nb5.jar to session directory
-        session_nb5_jar = session_dir / "nb5.jar"
-        shutil.copy(NB5_JAR_PATH, session_nb5_jar)
-        logger.info(f"Created session: {session_id}")
-        logger.info(f"Copied nb5.jar to session directory: {session_dir}")
-
-        return session_id
-
-    def process_files(
-        self,
-        schema_file: str,
-        conf_file: str,
-        output_file: str,
-        session_id: Optional[str] = None
-    ) -> Tuple[bool, str, Optional[Path]]:
-        """
-        Process CQL schema and configuration files to generate YAML.
-
-        Args:
-            schema_file (str): Path to the schema.cql file.
-            conf_file (str): Path to the configuration file.
-            output_file (str): Name for the output YAML file.
-            session_id (Optional[str]): Session ID, or None to create
-                a new session.
-
-        Returns:
-            Tuple[bool, str, Optional[Path]]: Success status, message,
-                and path to output file.
-        """
-        # Verify Java 23 is available
-        if not self._verify_java_version():
-            return (
-                False,
-                "Java 23 is not available. Please install Java 23 "
-                "and try again.",
-                None
-            )
 
-        # Create or use existing session
-        if session_id is None:
-            session_id = self.create_session()
+# Sessions created by this process, least recently used first.
+# Downloads of the generated file are resolved here without touching
+# the filesystem.
+_SESSIONS: "OrderedDict[str, SessionRec]" = OrderedDict()
+_evict_task: Optional[asyncio.Task] = None
 
-        session_dir = SESSIONS_DIR / session_id
-        logger.info(f"Processing files in session directory: {session_dir}")
 
-        try:
-            # Make sure nb5.jar is copied to the session directory
-            session_nb5_jar = session_dir / "nb5.jar"
-            if not session_nb5_jar.exists():
-                shutil.copy(NB5_JAR_PATH, session_nb5_jar)
-                logger.info(
-                    f"Copied nb5.jar to session directory: {session_dir}"
-                )
-
-            # Use the provided configuration file directly
-            conf_file_path = Path(conf_file)
-            logger.info(f"Using configuration file: {conf_file_path}")
-
-            # Set up paths for schema and output
-            schema_path = Path(schema_file)
-            output_path = session_dir / output_file
-
-            # Run nb5.jar from the session directory
-            cmd = [
-                "java", "--enable-preview", "-jar",
-                str(session_nb5_jar),
-                "cqlgen", str(schema_path), str(output_path),
-                "--show-stacktraces"
-            ]
-
-            logger.info(f"Running command: {' '.join(cmd)}")
-
-            process = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=False  # Don't raise an exception on non-zero exit
-            )
+async def _remove_sessions(session_ids: List[str]) -> None:
+    """Remove the directories of sessions dropped from _SESSIONS."""
+    for session_id in session_ids:
+        await run_in_threadpool(
+            _generator.remove_session_directory, session_id
+        )
 
-            if process.returncode != 0:
-                error_msg = f"Error generating YAML: {process.stderr}"
-                logger.error(error_msg)
-                return False, error_msg, None
-
-            if not output_path.exists():
-                error_msg = "Output file was not generated"
-                logger.error(error_msg)
-                return False, error_msg, None
-
-            logger.info(f"Successfully generated YAML file: {output_path}")
-            return True, "YAML file generated successfully", output_path
-
-        except Exception as e:
-            error_msg = f"Error processing files: {str(e)}"
-            logger.error(error_msg)
-            return False, error_msg, None
-
-    def remove_nb5_jar(self, session_id: str) -> None:
-        """
-        Remove only the nb5.jar file from the session directory.
-
-        Args:
-            session_id (str): The session ID.
-        """
-        session_dir = SESSIONS_DIR / session_id
-        session_nb5_jar = session_dir / "nb5.jar"
-
-        if session_nb5_jar.exists():
-            try:
-                session_nb5_jar.unlink()
-                logger.info(
-                    f"Deleted nb5.jar from session directory: {session_dir}"
-                )
-            except Exception as e:
-                logger.error(
-                    f"Error deleting nb5.jar from session {session_id}: {e}"
-                )
-        else:
-            logger.info(
-                f"nb5.jar not found in session {session_id}, "
-                "nothing to clean up"
-            )
 
+async def _add_session(session_id: str) -> None:
+    """
+    Record a new session, removing the least recently used ones while
+    there are more than MAX_SESSIONS.
 
-# FastAPI application for API access
-app = FastAPI(
-    title="CQL to YAML Generator API",
-    description="API for generating YAML files from CQL schema files",
-    version="1.0.0"
-)
+    Args:
+        session_id (str): The new session's ID.
+    """
+    _SESSIONS[session_id] = SessionRec(None, time.monotonic())
+    evicted = []
+    while len(_SESSIONS) > MAX_SESSIONS:
+        evicted.append(_SESSIONS.popitem(last=False)[0])
+    await _remove_sessions(evicted)
+
+
+async def _evict_sessions() -> None:
+    """Remove sessions older than SESSION_TTL_SECONDS, once a minute."""
+    while True:
+        await asyncio.sleep(SESSION_EVICT_INTERVAL_SECONDS)
+        # Use order is not creation order, so every entry is checked
+        cutoff = time.monotonic() - SESSION_TTL_SECONDS
+        expired = [
+            session_id for session_id, rec in _SESSIONS.items()
+            if rec.created <= cutoff
+        ]
+        for session_id in expired:
+            del _SESSIONS[session_id]
+        await _remove_sessions(expired)
+
+
+@app.on_event("startup")
+async def _startup() -> None:
+    """Create the shared generator, downloading nb5.jar if needed."""
+    global _generator, _evict_task
+    _generator = await run_in_threadpool(CQLGenerator)
+    # Sessions left behind by a previous run are not in _SESSIONS
+    await run_in_threadpool(_generator.sweep_expired_sessions)
+    # Uses the server cli_main started, if any, or starts one
+    await run_in_threadpool(_generator.start_nailgun_server)
+    _evict_task = asyncio.create_task(_evict_sessions())
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    """Stop the session eviction task and stop using Nailgun."""
+    if _evict_task is not None:
+        _evict_task.cancel()
+    if _generator is not None:
+        _generator.stop_nailgun_server()
+
+
+def _save_upload(upload: UploadFile, dest: str) -> None:
+    """
+    Copy an uploaded file to disk without buffering it all in memory.
+
+    Args:
+        upload (UploadFile): The uploaded file.
+        dest (str): Path to write the file to.
+    """
+    with open(dest, "wb") as f:
+        shutil.copyfileobj(upload.file, f, UPLOAD_CHUNK_SIZE)
 
 
 @app.post("/generate")
 async def generate_yaml(
-    background_tasks: BackgroundTasks,
     schema_file: UploadFile = File(...),
     conf_file: UploadFile = File(...)
 ) -> Dict[str, Any]:
@@ -261,11 +155,12 @@ async def generate_yaml(
         Dict[str, Any]: Response containing success status, message,
             and download URL.
     """
-    generator = CQLGenerator()
+    generator = _generator
 
     # Create a session
     session_id = generator.create_session()
     session_dir = SESSIONS_DIR / session_id
+    await _add_session(session_id)
 
     try:
         # Save uploaded files to session directory
@@ -273,35 +168,38 @@ async def generate_yaml(
         conf_path = session_dir / conf_file.filename  # Keep original filename
         output_file = "output.yaml"
 
-        # Save the uploaded schema file
-        with open(schema_path, "wb") as f:
-            f.write(await schema_file.read())
-
-        # Save the uploaded conf file with its original name
-        with open(conf_path, "wb") as f:
-            f.write(await conf_file.read())
+        # Save the schema file and the conf file (under its original
+        # name) concurrently
+        await asyncio.gather(
+            run_in_threadpool(_save_upload, schema_file, schema_path),
+            run_in_threadpool(_save_upload, conf_file, conf_path)
+        )
 
         logger.info(
-            f"Saved uploaded files to session directory: {session_dir}"
+            "Saved uploaded files to session directory: %s",
+            session_dir
         )
-        logger.info(f"Schema file: {schema_path}")
-        logger.info(f"Conf file: {conf_path}")
+        logger.info("Schema file: %s", schema_path)
+        logger.info("Conf file: %s", conf_path)
 
         # Process the files
-        success, message, output_path = generator.process_files(
-            str(schema_path),
-            str(conf_path),
-            output_file,
-            session_id
+        success, message, output_path = (
+            await generator.process_files_async(
+                str(schema_path),
+                output_file,
+                str(conf_path),
+                session_id
+            )
         )
 
         if not success:
-            # Only delete nb5.jar, not the whole session
-            background_tasks.add_task(generator.remove_nb5_jar, session_id)
             raise HTTPException(status_code=500, detail=message)
 
-        # Only delete nb5.jar, not the whole session
-        background_tasks.add_task(generator.remove_nb5_jar, session_id)
+        # The session may have been evicted while cqlgen ran
+        rec = _SESSIONS.get(session_id)
+        if rec is not None:
+            _SESSIONS[session_id] = rec._replace(output_path=output_path)
+            _SESSIONS.move_to_end(session_id)
 
         return {
             "success": True,
@@ -311,8 +209,6 @@ async def generate_yaml(
         }
 
     except Exception as e:
-        # Only delete nb5.jar, not the whole session
-        background_tasks.add_task(generator.remove_nb5_jar, session_id)
         error_msg = f"Error processing files: {str(e)}"
         logger.error(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
@@ -328,16 +224,23 @@ async def download_file(session_id: str, filename: str):
         filename (str): The file to download.
 
     Returns:
-        FileResponse: The file to download.
+        ZeroCopyFileResponse: The file to download.
     """
-    file_path = SESSIONS_DIR / session_id / filename
-
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found")
+    rec = _SESSIONS.get(session_id)
+    if rec is not None:
+        _SESSIONS.move_to_end(session_id)
+    if (rec is not None and rec.output_path is not None and
+            rec.output_path.name == filename):
+        file_path = rec.output_path
+    else:
+        # Other files, or sessions from another worker or a previous run
+        file_path = SESSIONS_DIR / session_id / filename
+        if not file_path.exists():
+            raise HTTPException(status_code=404, detail="File not found")
 
     # Do NOT clean up the session directory after download
-    # Just provide the file directly
-    response = FileResponse(
+    # Just provide the file directly, zero-copy where the server allows
+    response = ZeroCopyFileResponse(
         path=file_path,
         filename=filename,
         media_type="application/octet-stream"
@@ -352,9 +255,23 @@ def cli_main() -> None:
     """
     if len(sys.argv) > 1 and sys.argv[1] == "server":
         # Start API server
-        logger.info("Starting API server")
-        uvicorn.run("cqlgen_app:app", host="0.0.0.0", port=8001,
-                    reload=False)
+        # Worker processes each run their own generator, so one long
+        # cqlgen job does not hold up every request
+        workers = int(
+            os.environ.get("CQLGEN_WORKERS", os.cpu_count() or 2)
+        )
+        # Download nb5.jar, dump its CDS archive and start any Nailgun
+        # server once here; the workers then find them ready
+        generator = CQLGenerator()
+        generator.start_nailgun_server()
+        logger.info("Starting API server with %s workers", workers)
+        try:
+            # "auto" picks uvloop where it is installed (not on Windows)
+            uvicorn.run("cqlgen_app:app", host="0.0.0.0", port=8001,
+                        loop="auto", http="httptools", workers=workers,
+                        reload=False)
+        finally:
+            generator.stop_nailgun_server()
     elif len(sys.argv) >= 3:
         # CLI mode - process files directly
         schema_file = sys.argv[1]
@@ -365,21 +282,17 @@ def cli_main() -> None:
         conf_file = os.path.join(schema_dir, "cqlgen.conf")
 
         if not os.path.exists(conf_file):
-            logger.error(f"Configuration file not found: {conf_file}")
+            logger.error("Configuration file not found: %s", conf_file)
             sys.exit(1)
 
         generator = CQLGenerator()
         success, message, output_path = generator.process_files(
-            schema_file, conf_file, output_file
+            schema_file, output_file, conf_file
         )
 
-        # Only clean up the nb5.jar file, not the session directory
         if success:
-            session_id = os.path.basename(os.path.dirname(output_path))
-            generator.remove_nb5_jar(session_id)
-
             logger.info(message)
-            logger.info(f"Output file: {output_path}")
+            logger.info("Output file: %s", output_path)
             sys.exit(0)
         else:
             logger.error(message)
@@ -1,134 +1,1251 @@
 import os
+import re
+import sys
+import shlex
+import shutil
+import signal
+import socket
+import asyncio
+import inspect
+import functools
 import subprocess
-from typing import Dict
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logging is configured by the application entry point (main.py); a
+# library module only names its logger
 logger = logging.getLogger("dsbulk_manager")
 
+# Only the last lines of each output stream are kept in the result
+OUTPUT_TAIL_LINES = 2048
+# Longest single output line accepted from DSBulk
+OUTPUT_LINE_LIMIT = 1 << 20
+
+# Kernel buffer requested for the unload-to-load pipe; 1 MiB is the
+# default /proc/sys/fs/pipe-max-size for unprivileged processes
+PIPE_BUFFER_SIZE = 1 << 20
+# fcntl.F_SETPIPE_SZ is only exported from Python 3.10 on
+_F_SETPIPE_SZ = 1031
+
+# Seconds a timed-out DSBulk process group gets to exit after SIGTERM
+# before it is sent SIGKILL
+KILL_GRACE_SECONDS = 2
+
+# Successful count and unload results are reused for an identical
+# command while the cluster schema version is unchanged, for at most
+# RESULT_CACHE_TTL_SECONDS; the least recently used entry goes first
+RESULT_CACHE_SIZE = 1024
+RESULT_CACHE_TTL_SECONDS = 60
+_CACHEABLE_OPERATIONS = frozenset(("count", "unload"))
+
+# How long the keyspace/table/column names read from system_schema are
+# trusted before being read again
+SCHEMA_CACHE_TTL_SECONDS = 60
+
+# Main class run inside a Nailgun server when DSBULK_NAILGUN=1
+DSBULK_MAIN_CLASS = "com.datastax.oss.dsbulk.runner.DataStaxBulkLoader"
+NAILGUN_SERVER_CLASS = "com.facebook.nailgun.NGServer"
+NAILGUN_PORT = os.environ.get("DSBULK_NAILGUN_PORT", "2113")
+# How long a new Nailgun server gets to start listening
+NAILGUN_START_TIMEOUT_SECONDS = 30
+
+# Unload query template; keyspace and table are left unquoted so they
+# keep CQL's case-insensitive matching
+_UNLOAD_QUERY = 'SELECT "{pk}" FROM {ks}.{tbl}{tail}'
+_LIMIT_TAIL = " LIMIT {n};"
+# Restricts an unload to one token range; the last range is closed so
+# that MAX_TOKEN itself is included. {pk} lists every partition key
+# column, quoted.
+_TOKEN_RANGE = " WHERE token({pk}) >= {lo} AND token({pk}) {op} {hi}"
+
+# Token bounds of the Murmur3 partitioner, Cassandra's default
+MIN_TOKEN = -(1 << 63)
+MAX_TOKEN = (1 << 63) - 1
+# Number of token-range shards used by sharded unloads by default
+DEFAULT_UNLOAD_SHARDS = 8
+
+# A DSBulk command line. Generated commands are immutable, so repeated
+# requests for the same command share one cached object.
+Argv = Tuple[str, ...]
+
+# Called with ("stdout" | "stderr", line) for every line DSBulk prints;
+# may be a plain function or a coroutine function
+ProgressCallback = Callable[[str, str], object]
+
+
+def _grow_pipe(fd: int, size: int = PIPE_BUFFER_SIZE) -> None:
+    """
+    Enlarge a pipe's kernel buffer from the default 64 KiB on Linux
+
+    A larger buffer lets the writer run further ahead of the reader, so
+    both block and wake up less often. Elsewhere, or if the size is not
+    allowed, the pipe is left as it is.
+    """
+    if not sys.platform.startswith("linux"):
+        return
+    import fcntl
+    try:
+        fcntl.fcntl(fd, getattr(fcntl, "F_SETPIPE_SZ", _F_SETPIPE_SZ), size)
+    except OSError as e:
+        logger.debug("Could not resize pipe to %d bytes: %s", size, e)
+
+
+# DSBulk's end-of-run summary: a "total | failed | rows/s | ..." header
+# row followed by a row of values
+_SUMMARY_HEADER = re.compile(r"^\s*total\s*\|\s*failed\s*\|", re.M)
+_OPERATION_DIR = re.compile(r"Operation directory:\s*(\S.*?)\s*$", re.M)
+
+
+def _summary_value(value: str) -> Union[int, float, str]:
+    """Convert a summary cell ("1,000", "12.34") to a number if it is
+    one"""
+    value = value.replace(",", "")
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_dsbulk_output(stdout: str, stderr: str) -> Dict:
+    """
+    Extract run statistics from DSBulk's console output
+
+    Args:
+        stdout (str): Captured standard output
+        stderr (str): Captured standard error
+
+    Returns:
+        Dict: Any of "count" (the result of a count), "summary" (the
+        summary table, column name -> value) and "operation_directory"
+        (where DSBulk wrote its logs)
+    """
+    stats: Dict = {}
+    text = stdout + "\n" + stderr
+
+    match = _SUMMARY_HEADER.search(text)
+    if match is not None:
+        lines = text[match.start():].splitlines()
+        if len(lines) > 1:
+            names = [cell.strip() for cell in lines[0].split("|")]
+            values = [cell.strip() for cell in lines[1].split("|")]
+            stats["summary"] = {
+                name: _summary_value(value)
+                for name, value in zip(names, values) if name
+            }
+
+    match = _OPERATION_DIR.search(text)
+    if match is not None:
+        stats["operation_directory"] = match.group(1)
+
+    # A count prints the number of rows as the last line of stdout
+    lines = stdout.strip().splitlines()
+    if lines and lines[-1].strip().isdigit():
+        stats["count"] = int(lines[-1])
+    return stats
+
+
+def _wait_for_port(process: subprocess.Popen, port: int,
+                   timeout: float) -> bool:
+    """
+    Wait until a server process accepts connections on a loopback port
+
+    Args:
+        process (subprocess.Popen): The server; waiting stops if it exits
+        port (int): Port it listens on
+        timeout (float): Seconds to wait at most
+
+    Returns:
+        bool: True once the port accepts a connection
+    """
+    deadline = time.monotonic() + timeout
+    while process.poll() is None and time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_executable(name: str) -> str:
+    """
+    Resolve a program name to an absolute path once per process.
+
+    subprocess only launches through posix_spawn (no fork of this
+    process) when the executable has a directory component.
+    """
+    return shutil.which(name) or name
+
 
 class DSBulkManager:
-    def __init__(self, dsbulk_path: str = None):
+    # Shell metacharacters stripped from identifiers
+    _UNSAFE_CHARS = re.compile(r"[;&|><`$\\]")
+
+    # JVM flags for long runs (unload, load): reuse class-data archives
+    # but keep the full JIT tiers and default GC for throughput
+    _JVM_FLAGS = ("-Xshare:auto",)
+    # Flags for short runs (count), which are dominated by JVM startup:
+    # stop at the C1 JIT tier, skip the parallel GC threads and use
+    # small thread stacks
+    _JVM_SHORT_FLAGS = _JVM_FLAGS + (
+        "-XX:TieredStopAtLevel=1", "-XX:+UseSerialGC", "-Xss256k"
+    )
+
+    def __init__(self, dsbulk_path: str = None, session=None):
         # Use the provided path or default to a common location
         self.dsbulk_path = (
             dsbulk_path or
             os.path.expanduser("~/workspace/dsbulk-1.11.0.jar")
         )
+        # Optional connected cassandra-driver Session; when present,
+        # counts run as CQL queries instead of DSBulk JVMs
+        self.session = session
+        # The jar may still be downloading at construction time, so a
+        # missing jar is not an error here
+        self._jar_validated = os.path.exists(self.dsbulk_path)
+        self._set_jvm_flags()
+        # Dispatch commands to a warm JVM through Nailgun's `ng` client
+        # instead of starting one per command
+        self._use_nailgun = os.environ.get("DSBULK_NAILGUN") == "1"
+        self._nailgun_server: Optional[subprocess.Popen] = None
+        # keyspace -> table -> column names, from system_schema.columns
+        self._schema: Dict[str, Dict[str, frozenset]] = {}
+        # (keyspace, table) -> partition key columns, in key order
+        self._partition_keys: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        self._schema_loaded_at: Optional[float] = None
+        # (operation args..., schema version) -> (stored at, result)
+        self._result_cache: "OrderedDict[Tuple, Tuple[float, Dict]]" = \
+            OrderedDict()
 
     def validate_dsbulk_path(self) -> bool:
         """
         Validate that the DSBulk JAR file exists
 
+        A positive result is cached; a missing jar is checked again on
+        the next call.
+
         Returns:
             bool: True if the file exists, False otherwise
         """
         # Don't need to download here - that happens in main.py
-        return os.path.exists(self.dsbulk_path)
+        if not self._jar_validated:
+            self._jar_validated = os.path.exists(self.dsbulk_path)
+        return self._jar_validated
+
+    def refresh_path(self, dsbulk_path: str = None) -> bool:
+        """
+        Point the manager at a (possibly new) jar and validate it again
+
+        Args:
+            dsbulk_path (str, optional): New jar path; keeps the current
+                one if omitted
+
+        Returns:
+            bool: True if the file exists, False otherwise
+        """
+        if dsbulk_path:
+            self.dsbulk_path = dsbulk_path
+        self._jar_validated = os.path.exists(self.dsbulk_path)
+        self._set_jvm_flags()
+        return self._jar_validated
+
+    @property
+    def cds_archive_path(self) -> str:
+        """AppCDS archive of DSBulk's classes, next to the jar (see the
+        dsbulk-cds Makefile target)"""
+        return os.path.splitext(self.dsbulk_path)[0] + ".jsa"
+
+    def _set_jvm_flags(self) -> None:
+        """Pick the JVM flags for short and long runs, using the AppCDS
+        archive when one has been created for the current jar"""
+        archive = ()
+        if os.path.exists(self.cds_archive_path):
+            archive = (f"-XX:SharedArchiveFile={self.cds_archive_path}",)
+        self._jvm_short_flags = archive + self._JVM_SHORT_FLAGS
+        self._jvm_long_flags = archive + self._JVM_FLAGS
+
+    def start_nailgun_server(self) -> bool:
+        """
+        Start a Nailgun server with DSBulk on its classpath, if Nailgun
+        dispatch is enabled (DSBULK_NAILGUN=1)
+
+        The server jar is taken from NAILGUN_SERVER_JAR and the `ng`
+        client must be on PATH. The JVM, its loaded classes and JIT
+        state are then reused by every DSBulk command.
+
+        Returns:
+            bool: True if commands will be dispatched through Nailgun
+        """
+        if not self._use_nailgun or self._nailgun_server is not None:
+            return self._nailgun_server is not None
+        server_jar = os.environ.get("NAILGUN_SERVER_JAR")
+        if not server_jar or shutil.which("ng") is None:
+            logger.warning(
+                "DSBULK_NAILGUN=1 needs NAILGUN_SERVER_JAR and the ng "
+                "client; running DSBulk directly"
+            )
+            self._use_nailgun = False
+            return False
+
+        classpath = os.pathsep.join([self.dsbulk_path, server_jar])
+        # Nailgun turns System.exit() into the end of one run through a
+        # security manager, which Java 18+ only installs when allowed.
+        # The server is bound to loopback: anything that can reach it
+        # can run code in the JVM.
+        server = subprocess.Popen(
+            ["java", *self._jvm_long_flags, "-Djava.security.manager=allow",
+             "-cp", classpath, NAILGUN_SERVER_CLASS,
+             f"127.0.0.1:{NAILGUN_PORT}"],
+            stdout=subprocess.DEVNULL
+        )
+        if not _wait_for_port(server, int(NAILGUN_PORT),
+                              NAILGUN_START_TIMEOUT_SECONDS):
+            logger.warning(
+                "Nailgun server for DSBulk did not start listening on "
+                "port %s; running DSBulk directly", NAILGUN_PORT
+            )
+            server.kill()
+            server.wait()
+            self._use_nailgun = False
+            return False
+        self._nailgun_server = server
+        logger.info(
+            "Started Nailgun server for DSBulk (pid %s, port %s)",
+            server.pid, NAILGUN_PORT
+        )
+        return True
+
+    def stop_nailgun_server(self) -> None:
+        """Stop the Nailgun server started by start_nailgun_server"""
+        if self._nailgun_server is not None:
+            self._nailgun_server.terminate()
+            self._nailgun_server.wait()
+            self._nailgun_server = None
+
+    def _launcher(self, short: bool = False) -> Tuple[str, ...]:
+        """
+        Command prefix that runs DSBulk: the `ng` client when a Nailgun
+        server is running, otherwise a fresh JVM
+
+        Args:
+            short (bool): Use the startup-oriented JVM flags
+        """
+        if self._nailgun_server is not None:
+            return ("ng", "--nailgun-port", NAILGUN_PORT, DSBULK_MAIN_CLASS)
+        flags = self._jvm_short_flags if short else self._jvm_long_flags
+        return ("java", *flags, "-jar", self.dsbulk_path)
+
+    def _operation_index(self, argv: Sequence[str]) -> Optional[int]:
+        """
+        Index of the DSBulk operation (unload, load, ...) in argv, or None
+        unless argv runs this manager's DSBulk the way _launcher does
+
+        That is `java <flags> -jar <dsbulk_path>`, with only the manager's
+        own JVM flags, or the `ng` prefix while a Nailgun server is
+        running.
+        """
+        if not argv:
+            return None
+        if argv[0] == "ng":
+            if self._nailgun_server is None:
+                return None
+            prefix = ("ng", "--nailgun-port", NAILGUN_PORT, DSBULK_MAIN_CLASS)
+            if tuple(argv[:len(prefix)]) != prefix:
+                return None
+            index = len(prefix)
+        elif argv[0] == "java" and "-jar" in argv:
+            jar = list(argv).index("-jar")
+            allowed = set(self._jvm_long_flags) | set(self._jvm_short_flags)
+            if (not set(argv[1:jar]) <= allowed or
+                    jar + 1 >= len(argv) or
+                    argv[jar + 1] != self.dsbulk_path):
+                return None
+            index = jar + 2
+        else:
+            return None
+        return index if index < len(argv) else None
+
+    def is_dsbulk_command(self, argv: Sequence[str]) -> bool:
+        """
+        Check that argv launches this manager's DSBulk jar (via java -jar
+        with its own JVM flags, or its Nailgun server) rather than an
+        arbitrary program, jar or JVM option
+
+        Args:
+            argv (Sequence[str]): Parsed command
+
+        Returns:
+            bool: True for a DSBulk invocation with an operation
+        """
+        return self._operation_index(argv) is not None
+
+    def _load_schema(self) -> Dict[str, Dict[str, frozenset]]:
+        """Return the cached schema, reading system_schema.columns again
+        once it is older than SCHEMA_CACHE_TTL_SECONDS"""
+        now = time.monotonic()
+        if (self._schema_loaded_at is None or
+                now - self._schema_loaded_at > SCHEMA_CACHE_TTL_SECONDS):
+            schema: Dict[str, Dict[str, set]] = {}
+            partition_keys: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+            rows = self.session.execute(
+                "SELECT keyspace_name, table_name, column_name, kind, "
+                "position FROM system_schema.columns"
+            )
+            for keyspace, table, column, kind, position in rows:
+                schema.setdefault(keyspace, {}).setdefault(
+                    table, set()
+                ).add(column)
+                if kind == "partition_key":
+                    partition_keys.setdefault((keyspace, table), []).append(
+                        (position, column)
+                    )
+            self._schema = {
+                keyspace: {t: frozenset(c) for t, c in tables.items()}
+                for keyspace, tables in schema.items()
+            }
+            self._partition_keys = {
+                name: tuple(column for _, column in sorted(columns))
+                for name, columns in partition_keys.items()
+            }
+            self._schema_loaded_at = now
+        return self._schema
+
+    def _check_identifiers(self,
+                           keyspace: str,
+                           table: str,
+                           column: Optional[str] = None,
+                           unquoted: bool = False) -> None:
+        """
+        Reject a keyspace, table or column that does not exist before a
+        JVM is started for it
+
+        Only possible with a driver session; without one every name is
+        accepted. This reads system_schema when the cached copy is stale,
+        so call it off the event loop.
+
+        Args:
+            keyspace (str): Keyspace name
+            table (str): Table name
+            column (str, optional): Column name, always matched exactly
+                since generated queries quote it
+            unquoted (bool): Keyspace and table appear unquoted in a
+                generated query, so CQL lower-cases them; otherwise they
+                are -k/-t options, which DSBulk matches exactly
+
+        Raises:
+            ValueError: If a name is not in the schema
+        """
+        if self.session is None:
+            return
+        fold = str.lower if unquoted else str
+        tables = self._load_schema().get(fold(keyspace))
+        if tables is None:
+            raise ValueError(f"Unknown keyspace: {keyspace}")
+        columns = tables.get(fold(table))
+        if columns is None:
+            raise ValueError(f"Unknown table: {keyspace}.{table}")
+        if column is not None and column not in columns:
+            raise ValueError(
+                f"Unknown column: {column} in {keyspace}.{table}"
+            )
 
     def generate_unload_command(self,
                                 keyspace: str,
                                 table: str,
                                 primary_key: str,
                                 output_path: str,
-                                limit: int = 1000000) -> str:
-        """Generate a DSBulk unload command string for export"""
-
-        # Sanitize inputs to prevent command injection
-        keyspace = self._sanitize_input(keyspace)
-        table = self._sanitize_input(table)
-        primary_key = self._sanitize_input(primary_key)
+                                limit: int = 1000000) -> Argv:
+        """Generate a DSBulk unload argv for export"""
+        self._check_identifiers(
+            keyspace, table, primary_key, unquoted=True
+        )
+        argv = self._unload_argv(
+            self._launcher(),
+            keyspace, table, primary_key, output_path, limit
+        )
+        logger.debug("Generated DSBulk unload command args: %s", argv)
+        return argv
 
-        # Build the query with proper quoting
-        query = f'SELECT "{primary_key}" FROM {keyspace}.{table}'
+    def generate_sharded_unload_commands(
+        self,
+        keyspace: str,
+        table: str,
+        primary_key: str,
+        output_path: str,
+        shards: int = DEFAULT_UNLOAD_SHARDS,
+        limit: int = 1000000
+    ) -> List[Argv]:
+        """
+        Generate DSBulk unload argvs that each export one slice of the
+        token ring, so they can run concurrently
 
-        if limit and limit > 0:
-            query += f" LIMIT {limit};"
-        else:
-            query += ";"
+        Shard i writes to `<output_path>/shard-<i>`. The limit is split
+        evenly, so each shard exports at most ceil(limit / shards) rows.
 
-        # Build the command
-        command = f'java -jar {self.dsbulk_path} unload \\\n'
-        command += f'  -query "{query}" \\\n'
-        command += f'  -url {output_path}'
+        Args:
+            keyspace (str): Keyspace name
+            table (str): Table name
+            primary_key (str): Column to export; without a driver
+                session it must also be the table's only partition key
+                column, since the ranges are taken over it
+            output_path (str): Directory the shards are written under
+            shards (int): Number of token ranges
+            limit (int): Overall row limit; 0 or None for no limit
 
-        return command
+        Returns:
+            List[Argv]: One argv per token range
+        """
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self._check_identifiers(
+            keyspace, table, primary_key, unquoted=True
+        )
+        # token() takes the whole partition key, which the schema gives
+        # when there is a session
+        partition_key: Tuple[str, ...] = (primary_key,)
+        if self.session is not None:
+            partition_key = self._partition_keys[
+                (keyspace.lower(), table.lower())
+            ]
+        shard_limit = -(-limit // shards) if limit and limit > 0 else limit
+        step = (MAX_TOKEN - MIN_TOKEN) // shards
+        commands = []
+        for i in range(shards):
+            lo = MIN_TOKEN + i * step
+            hi = MAX_TOKEN if i == shards - 1 else lo + step
+            commands.append(self._unload_argv(
+                self._launcher(),
+                keyspace, table, primary_key,
+                os.path.join(output_path, f"shard-{i:03d}"),
+                shard_limit, (lo, hi), partition_key
+            ))
+        logger.debug("Generated %d sharded DSBulk unload commands", shards)
+        return commands
 
     def generate_load_command(self,
                               keyspace: str,
                               table: str,
-                              csv_path: str) -> str:
-        """Generate a DSBulk load command string for import"""
+                              csv_path: str) -> Argv:
+        """Generate a DSBulk load argv for import"""
+        self._check_identifiers(keyspace, table)
+        argv = self._load_argv(
+            self._launcher(), keyspace, table, csv_path
+        )
+        logger.debug("Generated DSBulk load command args: %s", argv)
+        return argv
+
+    def generate_count_command(self,
+                               keyspace: str,
+                               table: str) -> Argv:
+        """Generate a DSBulk count argv"""
+        self._check_identifiers(keyspace, table)
+        argv = self._count_argv(
+            self._launcher(short=True), keyspace, table
+        )
+        logger.debug("Generated DSBulk count command args: %s", argv)
+        return argv
+
+    def generate_unload_stdout_command(self,
+                                       keyspace: str,
+                                       table: str,
+                                       primary_key: str,
+                                       limit: int = 1000000) -> Argv:
+        """Generate a DSBulk unload argv that writes CSV to stdout"""
+        return self.generate_unload_command(
+            keyspace, table, primary_key, "-", limit
+        )
+
+    def generate_load_stdin_command(self,
+                                    keyspace: str,
+                                    table: str) -> Argv:
+        """Generate a DSBulk load argv that reads CSV from stdin"""
+        return self.generate_load_command(keyspace, table, "-")
 
+    def generate_batch_commands(self, ops: Sequence[Dict]) -> List[Argv]:
+        """
+        Generate argvs for a batch of DSBulk operations
+
+        DSBulk runs one operation per JVM, so a batch becomes one command
+        per distinct operation; identical operations are only run once.
+        Pass the result to execute_many to run them concurrently.
+
+        Args:
+            ops: Dicts with an "operation" key ("unload", "load" or
+                "count") plus the keyword arguments of the matching
+                generate_*_command method
+
+        Returns:
+            List[Argv]: One argv per distinct operation, in order
+
+        Raises:
+            ValueError: If an operation type is not supported
+        """
+        generators = {
+            "unload": self.generate_unload_command,
+            "load": self.generate_load_command,
+            "count": self.generate_count_command,
+        }
+        commands: Dict[Argv, Argv] = {}
+        for op in ops:
+            params = dict(op)
+            operation = params.pop("operation", None)
+            if operation not in generators:
+                raise ValueError(f"Unsupported operation: {operation}")
+            argv = generators[operation](**params)
+            commands.setdefault(argv, argv)
+        return list(commands.values())
+
+    # The builders below are pure, so repeated requests for the same
+    # command return the same cached tuple, which the generate_* methods
+    # hand out as is. They are static and take the launcher prefix
+    # explicitly so the cache does not keep managers alive.
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _unload_argv(launcher: Tuple[str, ...],
+                     keyspace: str,
+                     table: str,
+                     primary_key: str,
+                     output_path: str,
+                     limit: int,
+                     token_range: Optional[Tuple[int, int]] = None,
+                     partition_key: Sequence[str] = ()
+                     ) -> Tuple[str, ...]:
         # Sanitize inputs to prevent command injection
-        keyspace = self._sanitize_input(keyspace)
-        table = self._sanitize_input(table)
+        sanitize = DSBulkManager._sanitize_input
+        keyspace = sanitize(keyspace)
+        table = sanitize(table)
+        primary_key = sanitize(primary_key)
 
-        # Build the command
-        command = f'java -jar {self.dsbulk_path} load \\\n'
-        command += f'  -k {keyspace} -t {table} \\\n'
-        command += f'  -url {csv_path}'
+        # Build the query with proper quoting
+        tail = _LIMIT_TAIL.format(n=limit) if limit and limit > 0 else ";"
+        if token_range is not None:
+            lo, hi = token_range
+            columns = ", ".join(
+                f'"{sanitize(column)}"'
+                for column in partition_key or (primary_key,)
+            )
+            tail = _TOKEN_RANGE.format(
+                pk=columns, lo=lo, hi=hi,
+                op="<=" if hi == MAX_TOKEN else "<"
+            ) + tail
+        query = _UNLOAD_QUERY.format(
+            pk=primary_key, ks=keyspace, tbl=table, tail=tail
+        )
 
-        return command
+        return (
+            *launcher, "unload",
+            "-query", query,
+            "-url", output_path
+        )
 
-    def generate_count_command(self,
-                               keyspace: str,
-                               table: str) -> str:
-        """Generate a DSBulk count command string"""
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _load_argv(launcher: Tuple[str, ...],
+                   keyspace: str,
+                   table: str,
+                   csv_path: str) -> Tuple[str, ...]:
+        # Sanitize inputs to prevent command injection
+        sanitize = DSBulkManager._sanitize_input
+        return (
+            *launcher, "load",
+            "-k", sanitize(keyspace), "-t", sanitize(table),
+            "-url", csv_path
+        )
 
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _count_argv(launcher: Tuple[str, ...],
+                    keyspace: str,
+                    table: str) -> Tuple[str, ...]:
         # Sanitize inputs to prevent command injection
-        keyspace = self._sanitize_input(keyspace)
-        table = self._sanitize_input(table)
+        sanitize = DSBulkManager._sanitize_input
+        return (
+            *launcher, "count",
+            "-k", sanitize(keyspace), "-t", sanitize(table)
+        )
 
-        # Build the command
-        command = f'java -jar {self.dsbulk_path} count \\\n'
-        command += f'  -k {keyspace} -t {table}'
+    def format_command(self, argv: Sequence[str]) -> str:
+        """
+        Render a DSBulk argv as a shell-quoted, backslash-continued string
+        for display and scripts
+
+        Args:
+            argv (Sequence[str]): Command as returned by generate_*_command
+
+        Returns:
+            str: One line for the java invocation, one per option
 
-        return command
+        Raises:
+            TypeError: If given a command string instead of an argv
+        """
+        if isinstance(argv, str):
+            raise TypeError("format_command expects an argv, not a string")
+        # The launcher and the operation stay on the first line
+        index = self._operation_index(argv)
+        head = index + 1 if index is not None else 1
+        lines = [shlex.join(argv[:head])]
+        option: List[str] = []
+        for arg in argv[head:]:
+            if arg.startswith("-") and option:
+                lines.append(shlex.join(option))
+                option = []
+            option.append(arg)
+        if option:
+            lines.append(shlex.join(option))
+        return " \\\n  ".join(lines)
+
+    @staticmethod
+    def parse_command(command: str) -> List[str]:
+        """
+        Split a command string produced by format_command back into argv
+
+        Args:
+            command (str): Possibly multi-line command string
+
+        Returns:
+            List[str]: The command arguments
+        """
+        return shlex.split(command.replace("\\\n", " "))
 
-    def _sanitize_input(self, input_str: str) -> str:
+    @staticmethod
+    def _sanitize_input(input_str: str) -> str:
         """Sanitize input to prevent command injection"""
-        # Replace any potentially dangerous characters
-        return (input_str.replace(';', '').replace('&', '')
-                .replace('|', '').replace('>', '').replace('<', ''))
+        # Remove any potentially dangerous characters in a single pass
+        return DSBulkManager._UNSAFE_CHARS.sub('', input_str)
+
+    def count_native(self, keyspace: str, table: str) -> int:
+        """
+        Count the rows of a table with a CQL query over the injected
+        driver session, without starting a DSBulk JVM
+
+        Args:
+            keyspace (str): Keyspace name
+            table (str): Table name
+
+        Returns:
+            int: Number of rows
+
+        Raises:
+            RuntimeError: If no session was provided
+        """
+        if self.session is None:
+            raise RuntimeError("No Cassandra session configured")
+        # DSBulk matches -k/-t exactly, so the names are quoted to keep
+        # CQL from lower-casing them
+        quote = self._quote_identifier
+        row = self.session.execute(
+            f"SELECT count(*) FROM {quote(keyspace)}.{quote(table)}"
+        ).one()
+        return row[0]
+
+    @staticmethod
+    def _quote_identifier(name: str) -> str:
+        """Quote a CQL identifier, doubling any embedded double quote"""
+        return '"' + name.replace('"', '""') + '"'
+
+    def schema_version(self) -> Optional[str]:
+        """
+        Current schema version of the connected cluster
+
+        Returns:
+            Optional[str]: The version UUID, or None without a session
+        """
+        if self.session is None:
+            return None
+        row = self.session.execute(
+            "SELECT schema_version FROM system.local"
+        ).one()
+        return str(row[0])
+
+    def _cache_key(self, argv: Sequence[str]) -> Optional[Tuple]:
+        """
+        Result cache key for argv, or None if its result is not cached
+
+        Only counts and file unloads are cached, and only with a driver
+        session to read the schema version from. The launcher is not
+        part of the key, so java and Nailgun runs share entries.
+        """
+        index = self._operation_index(argv)
+        if (self.session is None or index is None or
+                argv[index] not in _CACHEABLE_OPERATIONS):
+            return None
+        ops = tuple(argv[index:])
+        if ops[0] == "unload" and self._option(ops, "-url") in (None, "-"):
+            return None
+        try:
+            version = self.schema_version()
+        except Exception as e:
+            logger.warning("Could not read schema version: %s", e)
+            return None
+        return ops + (version,)
+
+    @staticmethod
+    def _option(ops: Sequence[str], name: str) -> Optional[str]:
+        """Value of a DSBulk option in an operation's argument list"""
+        options = dict(zip(ops[1::2], ops[2::2]))
+        return options.get(name)
+
+    def _cached_result(self, key: Tuple) -> Optional[Dict]:
+        """Return a fresh cached result for key, dropping a stale one"""
+        entry = self._result_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        # An unload result is only useful while its output still exists
+        stale = time.monotonic() - stored_at > RESULT_CACHE_TTL_SECONDS
+        if not stale and key[0] == "unload":
+            stale = not os.path.exists(self._option(key[:-1], "-url"))
+        if stale:
+            del self._result_cache[key]
+            return None
+        self._result_cache.move_to_end(key)
+        return dict(result)
+
+    def _store_result(self, key: Tuple, result: Dict) -> None:
+        """Cache a successful result, evicting the least recently used"""
+        self._result_cache[key] = (time.monotonic(), dict(result))
+        self._result_cache.move_to_end(key)
+        while len(self._result_cache) > RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+
+    def clear_result_cache(self) -> None:
+        """Forget all cached count and unload results"""
+        self._result_cache.clear()
+
+    def _count_target(
+        self, argv: Sequence[str]
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Return (keyspace, table) if argv is a plain DSBulk count with no
+        options other than -k and -t, else None
+        """
+        index = self._operation_index(argv)
+        if index is None:
+            return None
+        ops = list(argv[index:])
+        if len(ops) != 5 or ops[0] != "count":
+            return None
+        options = dict(zip(ops[1::2], ops[2::2]))
+        if set(options) != {"-k", "-t"}:
+            return None
+        return options["-k"], options["-t"]
+
+    async def _execute_count_native(self, keyspace: str, table: str) -> Dict:
+        """Run a count through the driver session, shaped like a DSBulk
+        result"""
+        try:
+            count = await asyncio.to_thread(
+                self.count_native, keyspace, table
+            )
+        except Exception as e:
+            return self._error_result(e)
+        return {
+            "success": True,
+            "stdout": f"{count}\n",
+            "stderr": "",
+            "stats": {"count": count}
+        }
+
+    def _to_argv(self, command: Union[str, Sequence[str]]) -> List[str]:
+        """Accept either an argv or a formatted command string"""
+        if isinstance(command, str):
+            return self.parse_command(command)
+        return list(command)
+
+    @staticmethod
+    async def _spawn(argv: Sequence[str],
+                     **kwargs) -> asyncio.subprocess.Process:
+        """
+        Start a DSBulk process, on subprocess' posix_spawn fast path
+        where the other options allow it
+
+        That path needs an absolute executable and close_fds=False.
+        Python's own descriptors are non-inheritable, so leaving
+        close_fds off does not leak them into the JVM.
+        """
+        # Only build the shell-quoted command line if it will be logged
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Executing DSBulk: %s", shlex.join(argv))
+        argv = [_resolve_executable(argv[0]), *argv[1:]]
+        return await asyncio.create_subprocess_exec(
+            *argv, close_fds=False, limit=OUTPUT_LINE_LIMIT, **kwargs
+        )
+
+    @staticmethod
+    async def _kill_group(process: asyncio.subprocess.Process) -> None:
+        """
+        Stop a DSBulk process started in its own session, along with
+        anything it spawned: SIGTERM to the process group, then SIGKILL
+        after KILL_GRACE_SECONDS
+        """
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                if hasattr(os, "killpg"):
+                    os.killpg(process.pid, sig)
+                else:
+                    process.kill()
+            except ProcessLookupError:
+                break
+            try:
+                await asyncio.wait_for(process.wait(), KILL_GRACE_SECONDS)
+                return
+            except asyncio.TimeoutError:
+                continue
+        await process.wait()
+
+    @staticmethod
+    async def _drain(stream: asyncio.StreamReader,
+                     name: str,
+                     tail: deque,
+                     on_progress: Optional[ProgressCallback]) -> None:
+        """Read a process stream line by line into a bounded tail"""
+        async for raw in stream:
+            line = raw.decode(errors="replace")
+            tail.append(line)
+            if on_progress is not None:
+                result = on_progress(name, line)
+                if inspect.isawaitable(result):
+                    await result
+
+    async def execute_command(
+        self,
+        command: Union[str, Sequence[str]],
+        on_progress: Optional[ProgressCallback] = None,
+        timeout: Optional[float] = None
+    ) -> Dict:
+        """
+        Execute a DSBulk command and return results
+
+        With a driver session, successful counts and unloads are cached
+        per schema version (see RESULT_CACHE_TTL_SECONDS).
 
-    def execute_command(self, command: str) -> Dict:
-        """Execute a DSBulk command and return results"""
+        The JVM runs as an asyncio subprocess, so the event loop stays
+        free and several commands can run at once. Output is read as it
+        is produced; only the last OUTPUT_TAIL_LINES lines of each
+        stream are returned, so memory stays bounded on long runs.
+        Statistics parsed from the output (see parse_dsbulk_output) are
+        returned under "stats".
+
+        Args:
+            command: Argv list or formatted command string
+            on_progress: Optional callback receiving each output line
+            timeout: Seconds after which the process group is killed
+                and a failed result returned; None waits indefinitely
+        """
+        try:
+            argv = self._to_argv(command)
+        except Exception as e:
+            return self._error_result(e)
+
+        # Identical counts and unloads are answered from the cache
+        # while the schema is unchanged
+        key = await asyncio.to_thread(self._cache_key, argv)
+        if key is not None:
+            cached = self._cached_result(key)
+            if cached is not None:
+                logger.debug("Reusing cached DSBulk result for %s", key)
+                return cached
+
+        result = await self._run_command(argv, on_progress, timeout)
+        if key is not None and result["success"]:
+            self._store_result(key, result)
+        return result
+
+    async def _run_command(
+        self,
+        argv: List[str],
+        on_progress: Optional[ProgressCallback],
+        timeout: Optional[float]
+    ) -> Dict:
+        """Run a DSBulk command, natively for plain counts"""
         try:
+            # Plain counts skip the JVM when a driver session exists
+            if self.session is not None:
+                target = self._count_target(argv)
+                if target is not None:
+                    return await self._execute_count_native(*target)
+
             # Make sure dsbulk.jar exists before executing
             if not self.validate_dsbulk_path():
-                raise Exception(
+                raise FileNotFoundError(
                     f"DSBulk JAR file not found at {self.dsbulk_path}"
                 )
 
-            # Execute the command and capture output
-            result = subprocess.run(
-                command, shell=True, check=True,
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                text=True
+            # A timed-out or cancelled run is killed as a process group,
+            # which needs its own session
+            process = await self._spawn(
+                argv,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True
             )
+            stdout_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+            stderr_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+            try:
+                await asyncio.wait_for(asyncio.gather(
+                    self._drain(
+                        process.stdout, "stdout", stdout_tail, on_progress
+                    ),
+                    self._drain(
+                        process.stderr, "stderr", stderr_tail, on_progress
+                    ),
+                    process.wait()
+                ), timeout)
+            except asyncio.TimeoutError:
+                await self._kill_group(process)
+                error = f"DSBulk command timed out after {timeout} seconds"
+                logger.error(error)
+                return {
+                    "success": False,
+                    "error": error,
+                    "stdout": "".join(stdout_tail),
+                    "stderr": "".join(stderr_tail)
+                }
+            except asyncio.CancelledError:
+                # Don't leave the JVM running for a caller that is gone
+                await self._kill_group(process)
+                raise
+            result = self._result(
+                argv, process.returncode, stdout_tail, stderr_tail
+            )
+            # Parse off the event loop; the tails can be thousands of
+            # lines
+            result["stats"] = await asyncio.to_thread(
+                parse_dsbulk_output, result["stdout"], result["stderr"]
+            )
+            return result
+        except Exception as e:
+            return self._error_result(e)
 
-            return {
-                "success": True,
-                "stdout": result.stdout,
-                "stderr": result.stderr
-            }
-        except subprocess.CalledProcessError as e:
-            logger.error(f"DSBulk command execution failed: {e}")
+    @staticmethod
+    def _result(argv: Sequence[str],
+                returncode: int,
+                stdout_tail: deque,
+                stderr_tail: deque) -> Dict:
+        """Build the result dictionary for a finished DSBulk process"""
+        stdout = "".join(stdout_tail)
+        stderr = "".join(stderr_tail)
+
+        if returncode != 0:
+            error = subprocess.CalledProcessError(returncode, list(argv))
+            logger.error("DSBulk command execution failed: %s", error)
             return {
                 "success": False,
-                "error": str(e),
-                "stdout": e.stdout if hasattr(e, 'stdout') else "",
-                "stderr": e.stderr if hasattr(e, 'stderr') else ""
+                "error": str(error),
+                "stdout": stdout,
+                "stderr": stderr
             }
+
+        return {
+            "success": True,
+            "stdout": stdout,
+            "stderr": stderr
+        }
+
+    @staticmethod
+    def _error_result(e: Exception) -> Dict:
+        """Build the result dictionary for a DSBulk process that failed
+        to run at all"""
+        logger.error("Error during DSBulk command execution: %s", e)
+        return {
+            "success": False,
+            "error": str(e),
+            "stdout": "",
+            "stderr": f"Error: {str(e)}"
+        }
+
+    async def execute_pipeline(
+        self,
+        unload_command: Sequence[str],
+        load_command: Sequence[str],
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Dict:
+        """
+        Run a DSBulk unload straight into a DSBulk load through a pipe
+
+        The unload writes CSV to stdout and the load reads it from stdin
+        (see generate_unload_stdout_command and
+        generate_load_stdin_command), so no intermediate file is written
+        and loading starts with the first unloaded rows. The pipe joins
+        the two processes directly; the data never passes through this
+        process.
+
+        Args:
+            unload_command: Unload argv writing to "-url -"
+            load_command: Load argv reading from "-url -"
+            on_progress: Optional callback receiving each log line
+
+        Returns:
+            Dict: "success" plus the "unload" and "load" results
+        """
+        try:
+            if not self.validate_dsbulk_path():
+                raise FileNotFoundError(
+                    f"DSBulk JAR file not found at {self.dsbulk_path}"
+                )
+
+            read_fd, write_fd = os.pipe()
+            _grow_pipe(write_fd)
+            unload = None
+            try:
+                # Each in its own session so it can be killed as a group
+                unload = await self._spawn(
+                    unload_command,
+                    stdout=write_fd,
+                    stderr=asyncio.subprocess.PIPE,
+                    start_new_session=True
+                )
+                load = await self._spawn(
+                    load_command,
+                    stdin=read_fd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    start_new_session=True
+                )
+            except BaseException:
+                # The unload would otherwise keep running with nothing
+                # reading its output
+                if unload is not None:
+                    await self._kill_group(unload)
+                raise
+            finally:
+                # Only the children keep the pipe ends open, so the load
+                # sees EOF when the unload exits
+                os.close(read_fd)
+                os.close(write_fd)
+
+            unload_err = deque(maxlen=OUTPUT_TAIL_LINES)
+            load_out = deque(maxlen=OUTPUT_TAIL_LINES)
+            load_err = deque(maxlen=OUTPUT_TAIL_LINES)
+            try:
+                await asyncio.gather(
+                    self._drain(
+                        unload.stderr, "stderr", unload_err, on_progress
+                    ),
+                    self._drain(load.stdout, "stdout", load_out, on_progress),
+                    self._drain(load.stderr, "stderr", load_err, on_progress),
+                    unload.wait(),
+                    load.wait()
+                )
+            except asyncio.CancelledError:
+                await asyncio.gather(
+                    self._kill_group(unload), self._kill_group(load)
+                )
+                raise
         except Exception as e:
-            logger.error(f"Error during DSBulk command execution: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "stdout": "",
-                "stderr": f"Error: {str(e)}"
-            }
+            return self._error_result(e)
+
+        unload_result = self._result(
+            unload_command, unload.returncode, (), unload_err
+        )
+        load_result = self._result(
+            load_command, load.returncode, load_out, load_err
+        )
+        return {
+            "success": unload_result["success"] and load_result["success"],
+            "unload": unload_result,
+            "load": load_result
+        }
+
+    async def execute_many(
+        self,
+        commands: Sequence[Union[str, Sequence[str]]],
+        on_progress: Optional[ProgressCallback] = None,
+        timeout: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Execute several DSBulk commands concurrently
+
+        Args:
+            commands: Commands accepted by execute_command
+            on_progress: Optional callback passed to every command
+            timeout: Per-command timeout passed to execute_command
+
+        Returns:
+            List[Dict]: One result dictionary per command, in order
+        """
+        return await asyncio.gather(*(
+            self.execute_command(command, on_progress, timeout)
+            for command in commands
+        ))
+
+    async def execute_sharded_unload(
+        self,
+        keyspace: str,
+        table: str,
+        primary_key: str,
+        output_path: str,
+        shards: int = DEFAULT_UNLOAD_SHARDS,
+        limit: int = 1000000,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Dict:
+        """
+        Unload a table with one concurrent DSBulk per token range and
+        merge the shards into a single CSV
+
+        The merged file is `<output_path>/output-000001.csv`, the same
+        layout a single DSBulk unload produces; the shard directories
+        are removed once merged.
+
+        Args:
+            keyspace (str): Keyspace name
+            table (str): Table name
+            primary_key (str): Partition key column to export
+            output_path (str): Output directory
+            shards (int): Number of token ranges
+            limit (int): Overall row limit (see
+                generate_sharded_unload_commands)
+            on_progress: Optional callback passed to every shard
+
+        Returns:
+            Dict: {"success", "output", "shards"} where "shards" holds the
+            result of each shard's command
+        """
+        commands = await asyncio.to_thread(
+            self.generate_sharded_unload_commands,
+            keyspace, table, primary_key, output_path, shards, limit
+        )
+        results = await self.execute_many(commands, on_progress)
+        success = all(result["success"] for result in results)
+        output = None
+        if success:
+            shard_dirs = [argv[argv.index("-url") + 1] for argv in commands]
+            output = os.path.join(output_path, "output-000001.csv")
+            try:
+                await asyncio.to_thread(
+                    self._merge_csv_outputs, shard_dirs, output
+                )
+            except OSError as e:
+                logger.error("Could not merge unload shards: %s", e)
+                success, output = False, None
+        return {"success": success, "output": output, "shards": results}
+
+    @staticmethod
+    def _merge_csv_outputs(directories: Sequence[str], target: str) -> None:
+        """
+        Concatenate the CSV files DSBulk wrote to each directory into
+        target, keeping only the first header line, then remove the
+        directories
+        """
+        header_written = False
+        with open(target, "wb") as out:
+            for directory in directories:
+                names = sorted(
+                    name for name in os.listdir(directory)
+                    if name.endswith(".csv")
+                )
+                for name in names:
+                    with open(os.path.join(directory, name), "rb") as src:
+                        header = src.readline()
+                        if not header_written:
+                            out.write(header)
+                            header_written = True
+                        shutil.copyfileobj(src, out, 1 << 20)
+        for directory in directories:
+            shutil.rmtree(directory, ignore_errors=True)
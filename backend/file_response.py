@@ -0,0 +1,97 @@
+"""
+File responses that let the ASGI server send file contents with
+sendfile(2) when it supports the ASGI zero-copy send extension.
+"""
+
+import os
+import stat
+from typing import Sequence
+
+import anyio
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import FileResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+class ZeroCopyFileResponse(FileResponse):
+    """
+    FileResponse that hands the open file to the server instead of
+    streaming it through Python when the server advertises
+    `http.response.zerocopysend` in the request scope.
+
+    Servers without the extension (including stock uvicorn) get the
+    regular FileResponse body, read in larger chunks.
+    """
+
+    chunk_size = 1024 * 1024
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        extensions = scope.get("extensions") or {}
+        if self.send_header_only or ZEROCOPY_EXTENSION not in extensions:
+            await super().__call__(scope, receive, send)
+            return
+
+        if self.stat_result is None:
+            try:
+                stat_result = await anyio.to_thread.run_sync(
+                    os.stat, self.path
+                )
+            except FileNotFoundError:
+                raise RuntimeError(
+                    f"File at path {self.path} does not exist."
+                )
+            if not stat.S_ISREG(stat_result.st_mode):
+                raise RuntimeError(
+                    f"File at path {self.path} is not a file."
+                )
+            self.set_stat_headers(stat_result)
+        else:
+            stat_result = self.stat_result
+
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        with open(self.path, "rb") as file:
+            await send({
+                "type": ZEROCOPY_EXTENSION,
+                "file": file,
+                "offset": 0,
+                "count": stat_result.st_size,
+                "more_body": False,
+            })
+        if self.background is not None:
+            await self.background()
+
+
+class PathExcludingGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that leaves requests under some path prefixes alone.
+
+    GZipMiddleware only passes `http.response.body` messages through,
+    so routes returning a ZeroCopyFileResponse are excluded to let its
+    zero-copy message reach the server.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        exclude_prefixes: Sequence[str] = (),
+        **kwargs
+    ) -> None:
+        super().__init__(app, **kwargs)
+        self.exclude_prefixes = tuple(exclude_prefixes)
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] == "http" and \
+                scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -1,18 +1,32 @@
 from fastapi import (
-    FastAPI, UploadFile, File, Form, HTTPException, Query, BackgroundTasks
+    FastAPI, UploadFile, File, Form, Header, HTTPException, Query,
+    Response
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
-from typing import List, Optional
-import io
+from fastapi.responses import (
+    ORJSONResponse, PlainTextResponse, StreamingResponse
+)
+from collections import OrderedDict
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+import asyncio
+import codecs
+import hashlib
+import re
+import time
 import zipfile
-import json
+import orjson
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import shutil
 from pathlib import Path
+from urllib.parse import quote
 import logging
 import tempfile
+import threading
 from schema_parser import CQLParser
+from file_response import PathExcludingGZipMiddleware, ZeroCopyFileResponse
 
 # Configure logging
 logging.basicConfig(
@@ -28,6 +42,16 @@ PROJECT_ROOT = BASE_DIR
 SESSIONS_DIR = BASE_DIR / "sessions"
 SESSIONS_DIR.mkdir(exist_ok=True)
 
+# Behind nginx, USE_X_ACCEL=1 makes session downloads an empty response
+# with an X-Accel-Redirect header, and nginx sends the file itself.
+# X_ACCEL_SESSIONS_LOCATION must be an internal location aliased to
+# SESSIONS_DIR, e.g.:
+#   location /_protected_sessions/ { internal; alias /app/sessions/; }
+USE_X_ACCEL = os.environ.get("USE_X_ACCEL") == "1"
+X_ACCEL_SESSIONS_LOCATION = os.environ.get(
+    "X_ACCEL_SESSIONS_LOCATION", "/_protected_sessions/"
+)
+
 # NB5 and DSBulk JAR URLs and paths
 NB5_JAR_URL = (
     "https://github.com/nosqlbench/nosqlbench/releases/"
@@ -40,9 +64,29 @@ DSBULK_JAR_PATH = PROJECT_ROOT / f"dsbulk-{DSBULK_VERSION}.jar"
 DSBULK_DOWNLOAD_URL = (
     f"https://downloads.datastax.com/dsbulk/dsbulk-{DSBULK_VERSION}.tar.gz"
 )
+DSBULK_ARCHIVE_PATH = PROJECT_ROOT / f"dsbulk-{DSBULK_VERSION}.tar.gz"
+
+# JAR downloads are written in blocks of this size
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Shared HTTP session, so both JAR downloads (and GitHub's redirect to
+# its release storage) reuse pooled connections and retry transient
+# gateway errors
+_HTTP = requests.Session()
+_HTTP.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=5, backoff_factor=0.3, status_forcelist=[502, 503, 504]
+    )
+))
 
 # Create the application
-app = FastAPI(title="NoSQLBench Schema Generator")
+# Responses are serialized with orjson unless an endpoint says otherwise
+app = FastAPI(
+    title="NoSQLBench Schema Generator",
+    default_response_class=ORJSONResponse
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -53,8 +97,401 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory cache for the latest parsed schema
-SCHEMA_CACHE = {}
+# YAML, embedded in JSON or sent as text, compresses several times
+# over; bodies too small to gain from it are left alone. cqlgen
+# downloads are sent zero-copy, which compression would get in the way of.
+app.add_middleware(
+    PathExcludingGZipMiddleware,
+    exclude_prefixes=("/api/cqlgen/download/",),
+    minimum_size=1024
+)
+
+# Parsed schemas stored by the parse and generate endpoints, keyed by
+# schema_hash, least recently used first, so one client's upload does
+# not push out the schema another client is still working on. The most
+# recently stored key serves requests that do not send a schema.
+SCHEMA_CACHE_SIZE = 256
+SCHEMA_CACHE: "OrderedDict[bytes, dict]" = OrderedDict()
+_latest_schema_key: Optional[bytes] = None
+
+
+class ParsedSchema(NamedTuple):
+    """A parsed schema, with its table names listed once at parse time."""
+    parsed_at: float
+    info: dict
+    tables: List[str]
+
+
+# Parsed schemas keyed by a hash of their canonical CQL text (see
+# canonicalize_cql), least recently used first, so re-uploading a
+# schema does not parse it again
+PARSED_SCHEMA_CACHE_SIZE = 128
+PARSED_SCHEMA_TTL_SECONDS = 3600
+PARSED_SCHEMAS: "OrderedDict[bytes, ParsedSchema]" = OrderedDict()
+# Schemas are parsed in worker threads
+_PARSED_SCHEMAS_LOCK = threading.Lock()
+
+
+def schema_hash(schema_text: str) -> bytes:
+    """
+    Hash schema text for use as a cache key.
+
+    Args:
+        schema_text (str): CQL schema or schema JSON
+
+    Returns:
+        bytes: 16-byte BLAKE2b digest
+    """
+    return hashlib.blake2b(
+        schema_text.encode('utf-8'), digest_size=16
+    ).digest()
+
+
+# Quoted literals and identifiers (kept as they are), or a run of
+# whitespace and comments
+_CQL_TOKENS = re.compile(
+    r"""('(?:[^']|'')*'|"(?:[^"]|"")*")"""
+    r"""|(?:\s|/\*.*?\*/|(?:--|//)[^\n]*)+""",
+    re.DOTALL
+)
+
+
+def _canonical_token(match: "re.Match") -> str:
+    """Keep a quoted token; replace a comment or whitespace run."""
+    return match.group(1) or ' '
+
+
+def canonicalize_cql(schema_text: str) -> str:
+    """
+    Strip comments from CQL and collapse whitespace to single spaces,
+    leaving quoted strings and identifiers untouched.
+
+    Schemas that differ only in layout or comments canonicalize to the
+    same text, so they share a parse cache entry.
+
+    Args:
+        schema_text (str): CQL schema
+
+    Returns:
+        str: The canonical CQL text
+    """
+    return _CQL_TOKENS.sub(_canonical_token, schema_text).strip()
+
+
+def get_parsed_schema(schema_text: str) -> Tuple[bytes, ParsedSchema]:
+    """
+    Parse a CQL schema, reusing the result of an earlier parse of the
+    same canonical text if it is less than PARSED_SCHEMA_TTL_SECONDS old.
+
+    The canonical text is both the cache key and what gets parsed, so a
+    cached result is the same whichever equivalent upload came first.
+
+    Args:
+        schema_text (str): CQL schema
+
+    Returns:
+        Tuple[bytes, ParsedSchema]: The schema_hash of the canonical
+            text, which callers reuse as its cache key, and the parsed
+            schema
+    """
+    schema_text = canonicalize_cql(schema_text)
+    key = schema_hash(schema_text)
+    now = time.monotonic()
+    with _PARSED_SCHEMAS_LOCK:
+        entry = PARSED_SCHEMAS.get(key)
+        if (entry is not None and
+                now - entry.parsed_at <= PARSED_SCHEMA_TTL_SECONDS):
+            PARSED_SCHEMAS.move_to_end(key)
+            return key, entry
+
+    schema_info = parser.parse_cql(schema_text)
+    entry = ParsedSchema(now, schema_info, list(schema_info["tables"]))
+    with _PARSED_SCHEMAS_LOCK:
+        PARSED_SCHEMAS[key] = entry
+        PARSED_SCHEMAS.move_to_end(key)
+        while len(PARSED_SCHEMAS) > PARSED_SCHEMA_CACHE_SIZE:
+            PARSED_SCHEMAS.popitem(last=False)
+    return key, entry
+
+
+# Generated YAML keyed by (schema hash, table name), least recently
+# used first. Tables of a schema leave with it when it is evicted from
+# SCHEMA_CACHE.
+YAML_CACHE_SIZE = 512
+YAML_CACHE: "OrderedDict[Tuple[bytes, str], str]" = OrderedDict()
+_YAML_CACHE_LOCK = threading.Lock()
+
+
+def set_latest_schema(schema_info: dict, key: bytes) -> None:
+    """
+    Store a parsed schema and remember it as the latest one, for
+    requests that do not send their own.
+
+    Args:
+        schema_info (dict): Parsed schema information
+        key (bytes): schema_hash of the text the schema came from
+    """
+    global _latest_schema_key
+    SCHEMA_CACHE[key] = schema_info
+    SCHEMA_CACHE.move_to_end(key)
+    _latest_schema_key = key
+
+    evicted = set()
+    while len(SCHEMA_CACHE) > SCHEMA_CACHE_SIZE:
+        evicted.add(SCHEMA_CACHE.popitem(last=False)[0])
+    if evicted:
+        with _YAML_CACHE_LOCK:
+            for cached_key in [k for k in YAML_CACHE if k[0] in evicted]:
+                del YAML_CACHE[cached_key]
+
+
+def get_stored_schema(key: Optional[bytes]) -> Optional[dict]:
+    """
+    Look up a schema stored with set_latest_schema.
+
+    Args:
+        key (Optional[bytes]): schema_hash of the schema; None (no
+            schema stored yet) finds nothing
+
+    Returns:
+        Optional[dict]: The parsed schema, or None if it is not stored
+    """
+    schema_info = SCHEMA_CACHE.get(key)
+    if schema_info is not None:
+        SCHEMA_CACHE.move_to_end(key)
+    return schema_info
+
+
+def get_schema_yaml(schema_info: dict, key: bytes, table_name: str) -> str:
+    """
+    Generate the NoSQLBench YAML for a table, reusing earlier output for
+    the same schema and table.
+
+    Args:
+        schema_info (dict): Parsed schema information
+        key (bytes): schema_hash of the text the schema came from
+        table_name (str): Table to generate the YAML for
+
+    Returns:
+        str: The YAML content
+    """
+    cache_key = (key, table_name)
+    with _YAML_CACHE_LOCK:
+        yaml_content = YAML_CACHE.get(cache_key)
+        if yaml_content is not None:
+            YAML_CACHE.move_to_end(cache_key)
+            return yaml_content
+
+    yaml_content = parser.generate_nosqlbench_yaml(schema_info, table_name)
+    with _YAML_CACHE_LOCK:
+        YAML_CACHE[cache_key] = yaml_content
+        while len(YAML_CACHE) > YAML_CACHE_SIZE:
+            YAML_CACHE.popitem(last=False)
+    return yaml_content
+
+# Uploads are read and decoded in blocks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Accepted upload file extensions, compared in lower case
+YAML_EXTENSIONS = frozenset(('.yaml', '.yml'))
+CQL_EXTENSIONS = frozenset(('.cql', '.txt'))
+ZIP_EXTENSIONS = frozenset(('.zip',))
+
+
+def has_extension(filename: Optional[str], extensions: frozenset) -> bool:
+    """
+    Check a file name against a set of accepted extensions, ignoring
+    case (so `schema.CQL` is accepted).
+
+    Args:
+        filename (Optional[str]): The file name; None or empty when the
+            client sent none
+        extensions (frozenset): Accepted extensions, lower case
+
+    Returns:
+        bool: True if the file name has one of the extensions
+    """
+    return os.path.splitext(filename or '')[1].lower() in extensions
+
+
+async def read_upload_text(upload: UploadFile) -> str:
+    """
+    Read an uploaded file as UTF-8 text, decoding it block by block.
+
+    Only one block of raw bytes is held at a time, rather than the whole
+    upload alongside its decoded copy.
+
+    Args:
+        upload (UploadFile): The uploaded file
+
+    Returns:
+        str: The decoded file contents
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    parts = []
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b'', final=True))
+    return ''.join(parts)
+
+
+# Fixed parts of the generated shell scripts; only the summary line and
+# the command change between requests
+DSBULK_SCRIPT_HEADER = (
+    "#!/bin/bash\n\n"
+    "# DSBulk unload script generated by NoSQLBench Schema Generator\n"
+)
+NB5_SCRIPT_HEADER = (
+    "#!/bin/bash\n\n"
+    "# NoSQLBench 5 execution script generated by NoSQLBench "
+    "Schema Generator\n"
+)
+SCRIPT_FOOTER = "\n\n# End of script\n"
+
+
+def shell_script(header: str, summary: str, command: str) -> str:
+    """
+    Wrap a command in a downloadable bash script.
+
+    Args:
+        header (str): One of the *_SCRIPT_HEADER constants
+        summary (str): One-line description of what it does
+        command (str): The formatted command line
+
+    Returns:
+        str: The script text
+    """
+    return "".join(
+        (header, "# ", summary, "\n\n", command, SCRIPT_FOOTER)
+    )
+
+
+def save_upload(
+    upload: UploadFile, dest: Path, decode: bool = False
+) -> Optional[str]:
+    """
+    Copy an uploaded file to disk block by block, without holding it
+    all in memory. Blocking; run it in a worker thread.
+
+    With decode set, each block is also decoded as UTF-8 as it is
+    written, so a caller that needs the text does not read the file a
+    second time.
+
+    Args:
+        upload (UploadFile): The uploaded file
+        dest (Path): Path to write the file to
+        decode (bool): Also return the contents as text
+
+    Returns:
+        Optional[str]: The decoded contents, or None if not asked for
+            or the file is not valid UTF-8
+    """
+    upload.file.seek(0)
+    with open(dest, "wb") as f:
+        if not decode:
+            shutil.copyfileobj(upload.file, f, UPLOAD_CHUNK_SIZE)
+            return None
+
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        parts: Optional[List[str]] = []
+        while True:
+            chunk = upload.file.read(UPLOAD_CHUNK_SIZE)
+            if parts is not None:
+                try:
+                    parts.append(decoder.decode(chunk, final=not chunk))
+                except UnicodeDecodeError:
+                    # Keep copying; the caller reports the bad encoding
+                    parts = None
+            if not chunk:
+                break
+            f.write(chunk)
+    return None if parts is None else ''.join(parts)
+
+
+async def save_uploads(
+    schema_file: UploadFile,
+    schema_path: Path,
+    conf_file: Optional[UploadFile],
+    conf_path: Optional[Path],
+    decode_schema: bool = False
+) -> Optional[str]:
+    """
+    Save an uploaded schema file and optional conf file concurrently.
+
+    Args:
+        schema_file (UploadFile): The uploaded schema file
+        schema_path (Path): Where to save the schema file
+        conf_file (Optional[UploadFile]): The uploaded conf file, if any
+        conf_path (Optional[Path]): Where to save the conf file
+        decode_schema (bool): Also return the schema as text
+
+    Returns:
+        Optional[str]: The schema text, as returned by save_upload
+    """
+    saves = [asyncio.to_thread(
+        save_upload, schema_file, schema_path, decode_schema
+    )]
+    if conf_file:
+        saves.append(asyncio.to_thread(save_upload, conf_file, conf_path))
+    results = await asyncio.gather(*saves)
+    return results[0]
+
+
+def download_file(url: str, target: Path) -> None:
+    """
+    Download a URL to a file through a resumable `<target>.part` file.
+
+    An interrupted download leaves the .part file behind, and the next
+    call asks the server for the remaining bytes only (an HTTP Range
+    request). The target is only replaced, atomically, once the number
+    of bytes received matches what the server announced, so a partial
+    file is never taken for a complete one.
+
+    Args:
+        url (str): URL to download
+        target (Path): Destination file
+
+    Raises:
+        IOError: If the download ends short of the announced length
+        requests.RequestException: If the request fails
+    """
+    part = target.with_name(target.name + ".part")
+    os.makedirs(target.parent, exist_ok=True)
+    offset = part.stat().st_size if part.exists() else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    with _HTTP.get(
+        url, stream=True, headers=headers, timeout=(5, 30)
+    ) as response:
+        if response.status_code == 416:
+            # The .part file does not fit the current file; start over
+            part.unlink()
+            return download_file(url, target)
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            # The server ignored the range and is sending everything
+            offset = 0
+
+        expected = None
+        length = response.headers.get("Content-Length")
+        if length is not None:
+            expected = offset + int(length)
+
+        # Copy the socket stream straight into the file in large reads,
+        # decoding any Content-Encoding the way iter_content() would
+        response.raw.decode_content = True
+        with open(part, 'ab' if offset else 'wb') as f:
+            shutil.copyfileobj(response.raw, f, DOWNLOAD_CHUNK_SIZE)
+
+    size = part.stat().st_size
+    if expected is not None and size != expected:
+        raise IOError(
+            f"Incomplete download of {url}: got {size} of {expected} bytes"
+        )
+    os.replace(part, target)
 
 
 # Helper function to download NB5 JAR
@@ -68,15 +505,7 @@ def ensure_nb5_jar():
     if not NB5_JAR_PATH.exists():
         logger.info(f"nb5.jar not found at {NB5_JAR_PATH}, downloading...")
         try:
-            response = requests.get(NB5_JAR_URL, stream=True)
-            response.raise_for_status()
-
-            # Create parent directories if they don't exist
-            os.makedirs(os.path.dirname(NB5_JAR_PATH), exist_ok=True)
-
-            with open(NB5_JAR_PATH, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            download_file(NB5_JAR_URL, NB5_JAR_PATH)
             logger.info(f"nb5.jar downloaded successfully to {NB5_JAR_PATH}")
         except Exception as e:
             logger.error(f"Failed to download nb5.jar: {e}")
@@ -99,52 +528,47 @@ def ensure_dsbulk():
         logger.info(f"DSBulk not found at {DSBULK_JAR_PATH}, downloading...")
         try:
             import tarfile
-            import shutil
-
-            # Create temporary directory
-            temp_dir = tempfile.mkdtemp()
-            temp_file = os.path.join(temp_dir, "dsbulk.tar.gz")
 
-            # Download the file
+            # Download the archive next to the jar, so an interrupted
+            # download can be resumed on the next start
+            temp_file = DSBULK_ARCHIVE_PATH
             logger.info(f"Downloading DSBulk from {DSBULK_DOWNLOAD_URL}")
-            response = requests.get(DSBULK_DOWNLOAD_URL, stream=True)
-            response.raise_for_status()
+            download_file(DSBULK_DOWNLOAD_URL, temp_file)
 
-            # Save the file
-            with open(temp_file, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-
-            # Extract the archive
-            logger.info("Extracting DSBulk archive")
-            with tarfile.open(temp_file, 'r:gz') as tar:
-                tar.extractall(path=temp_dir)
-
-            # Find the jar file in the extracted directory
-            dsbulk_dir = os.path.join(temp_dir, f"dsbulk-{DSBULK_VERSION}")
+            # Extract only the DSBulk jar, preferring the versioned one
+            # over other dsbulk*.jar libraries in the archive
+            logger.info("Extracting DSBulk jar from archive")
+            preferred = f"dsbulk-{DSBULK_VERSION}.jar"
             jar_found = False
+            with tarfile.open(temp_file, 'r:gz') as tar:
+                candidates = [
+                    member for member in tar.getmembers()
+                    if member.isfile() and
+                    os.path.basename(member.name).endswith(".jar") and
+                    "dsbulk" in os.path.basename(member.name).lower()
+                ]
+                member = next(
+                    (m for m in candidates
+                     if os.path.basename(m.name) == preferred),
+                    candidates[0] if candidates else None
+                )
+                if member is not None:
+                    # Create parent directories of target if needed
+                    os.makedirs(os.path.dirname(DSBULK_JAR_PATH),
+                                exist_ok=True)
+
+                    jar_part = f"{DSBULK_JAR_PATH}.part"
+                    with tar.extractfile(member) as src, \
+                            open(jar_part, 'wb') as dst:
+                        shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK_SIZE)
+                    os.replace(jar_part, DSBULK_JAR_PATH)
+                    logger.info(
+                        f"Extracted {member.name} to {DSBULK_JAR_PATH}"
+                    )
+                    jar_found = True
 
-            for root, dirs, files in os.walk(dsbulk_dir):
-                for file in files:
-                    if (file.endswith(".jar") and
-                            "dsbulk" in file.lower()):
-                        jar_path = os.path.join(root, file)
-
-                        # Create parent directories of target if needed
-                        os.makedirs(os.path.dirname(DSBULK_JAR_PATH),
-                                   exist_ok=True)
-
-                        # Copy jar to target destination
-                        shutil.copy2(jar_path, DSBULK_JAR_PATH)
-                        logger.info(f"Copied {jar_path} to {DSBULK_JAR_PATH}")
-                        jar_found = True
-                        break
-
-                if jar_found:
-                    break
-
-            # Clean up temp directory
-            shutil.rmtree(temp_dir)
+            # Clean up the archive
+            os.unlink(temp_file)
 
             if not jar_found:
                 raise Exception(
@@ -174,6 +598,20 @@ nb5_executor = NB5Executor(str(NB5_JAR_PATH))
 dsbulk_manager = DSBulkManager(str(DSBULK_JAR_PATH))
 cql_generator = CQLGenerator()
 
+# How often cqlgen session directories past their TTL are removed
+SESSION_SWEEP_INTERVAL_SECONDS = 60
+_sweep_task: Optional[asyncio.Task] = None
+
+
+async def sweep_sessions_periodically():
+    """
+    Remove expired cqlgen session directories, at startup and then every
+    SESSION_SWEEP_INTERVAL_SECONDS
+    """
+    while True:
+        await asyncio.to_thread(cql_generator.sweep_expired_sessions)
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL_SECONDS)
+
 
 # Application startup event handler
 @app.on_event("startup")
@@ -185,42 +623,67 @@ async def startup_event():
     """
     logger.info("Initializing NoSQLBench Flow application...")
 
-    # Ensure NB5 jar is available
-    logger.info("Checking for nb5.jar...")
-    nb5_path = BASE_DIR / "nb5.jar"
+    # Ensure both jars are available. The downloads are independent and
+    # blocking, so they run side by side in worker threads and the event
+    # loop keeps serving requests meanwhile.
+    logger.info("Checking for nb5.jar and dsbulk.jar...")
+    nb5_path, dsbulk_path = await asyncio.gather(
+        asyncio.to_thread(ensure_nb5_jar),
+        asyncio.to_thread(ensure_dsbulk)
+    )
     logger.info(f"NB5 jar path: {nb5_path}")
-
-    # Ensure DSBulk jar is available
-    logger.info("Checking for dsbulk.jar...")
-    dsbulk_path = ensure_dsbulk()
     logger.info(f"DSBulk jar path: {dsbulk_path}")
 
     # Update the paths in the executors
     nb5_executor.nb5_path = str(nb5_path)
-    dsbulk_manager.dsbulk_path = str(dsbulk_path)
+    dsbulk_manager.refresh_path(str(dsbulk_path))
+    # Each start waits for its server to listen, so they run side by
+    # side off the event loop as well
+    await asyncio.gather(
+        asyncio.to_thread(dsbulk_manager.start_nailgun_server),
+        asyncio.to_thread(cql_generator.start_nailgun_server)
+    )
+
+    # Also clears sessions left behind by a previous run
+    global _sweep_task
+    _sweep_task = asyncio.create_task(sweep_sessions_periodically())
 
     logger.info("Initialization complete!")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Application shutdown event handler.
+    Stops the session sweep and the DSBulk and nb5 Nailgun servers, if
+    they were started.
+    """
+    if _sweep_task is not None:
+        _sweep_task.cancel()
+    dsbulk_manager.stop_nailgun_server()
+    cql_generator.stop_nailgun_server()
+
+
 @app.post("/api/parse-schema")
 async def parse_schema(schema_file: UploadFile = File(...)):
     """Parse a CQL schema file and return structured information"""
-    if not schema_file.filename.endswith(('.cql', '.txt')):
+    if not has_extension(schema_file.filename, CQL_EXTENSIONS):
         raise HTTPException(
             status_code=400,
             detail="Invalid file type. Please upload a .cql or .txt file"
         )
 
-    content = await schema_file.read()
-    schema_text = content.decode('utf-8')
+    schema_text = await read_upload_text(schema_file)
 
     try:
-        schema_info = parser.parse_cql(schema_text)
+        key, parsed = await asyncio.to_thread(
+            get_parsed_schema, schema_text
+        )
 
         # Store the schema in cache for later use
-        SCHEMA_CACHE['latest'] = schema_info
+        set_latest_schema(parsed.info, key)
 
-        return JSONResponse(content=schema_info)
+        return ORJSONResponse(content=parsed.info)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -235,8 +698,8 @@ async def generate_yaml(
 ):
     """Generate NoSQLBench YAML files for selected tables"""
     try:
-        schema_info = json.loads(schema_json)
-        selected_tables = json.loads(table_selection)
+        schema_info = orjson.loads(schema_json)
+        selected_tables = orjson.loads(table_selection)
 
         if not selected_tables:
             raise HTTPException(
@@ -244,13 +707,14 @@ async def generate_yaml(
             )
 
         # Store the schema in cache for later use
-        SCHEMA_CACHE['latest'] = schema_info
+        key = schema_hash(schema_json)
+        set_latest_schema(schema_info, key)
 
         # Process the tables and return them in JSON format
         processed_files = []
         for table_name in selected_tables:
-            yaml_content = parser.generate_nosqlbench_yaml(
-                schema_info, table_name
+            yaml_content = await asyncio.to_thread(
+                get_schema_yaml, schema_info, key, table_name
             )
 
             # Clean the table name for the filename
@@ -264,7 +728,7 @@ async def generate_yaml(
             })
 
         # Return a JSON response with all files
-        return JSONResponse(content={
+        return ORJSONResponse(content={
             "message": f"Successfully generated {len(processed_files)} "
                       "YAML files",
             "files": processed_files
@@ -276,65 +740,132 @@ async def generate_yaml(
         )
 
 
+def open_zip_yamls(fileobj) -> Tuple[zipfile.ZipFile, List[str]]:
+    """
+    Open a zip archive and list its YAML members.
+
+    Args:
+        fileobj: Seekable binary file holding the archive
+
+    Returns:
+        Tuple[zipfile.ZipFile, List[str]]: The open archive, which the
+        caller must close, and the names of its YAML members
+
+    Raises:
+        zipfile.BadZipFile: If the file is not a zip archive
+    """
+    # The upload may already have been read from
+    fileobj.seek(0)
+    input_zip = zipfile.ZipFile(fileobj, 'r')
+    return input_zip, [
+        name for name in input_zip.namelist()
+        if has_extension(name, YAML_EXTENSIONS)
+    ]
+
+
+def read_yaml_filename(path: str) -> str:
+    """Name of the read YAML generated from an ingestion YAML"""
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    return f"{base_name}_read.yaml"
+
+
+async def files_json_response(
+    files: AsyncIterator[dict]
+) -> Optional[StreamingResponse]:
+    """
+    Stream processed files as {"files": [...], "message": ...} JSON,
+    serializing each file as soon as it is ready instead of holding the
+    whole list.
+
+    The first file is produced before the response starts, so failures
+    on it are still reported with an error status. A later failure can
+    no longer change the status; the document is then closed with an
+    "error" field next to "files" and "message". Uploads stay open
+    until the response has been sent, so the iterator may keep reading
+    them.
+
+    Args:
+        files (AsyncIterator[dict]): Processed files, each with
+            "filename" and "content"
+
+    Returns:
+        Optional[StreamingResponse]: The response, or None if files is
+        empty
+    """
+    try:
+        first = await files.__anext__()
+    except StopAsyncIteration:
+        return None
+
+    async def body() -> AsyncIterator[bytes]:
+        yield b'{"files":[' + orjson.dumps(first)
+        count = 1
+        try:
+            async for item in files:
+                yield b',' + orjson.dumps(item)
+                count += 1
+        except Exception as e:
+            logger.error(f"Error after {count} processed files: {str(e)}")
+            error = f"Error processing files: {str(e)}"
+            message = f"Processed {count} files before an error"
+            yield (
+                b'],"error":' + orjson.dumps(error) +
+                b',"message":' + orjson.dumps(message) + b'}'
+            )
+            return
+        message = f"Successfully processed {count} files"
+        yield b'],"message":' + orjson.dumps(message) + b'}'
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
 @app.post("/api/process-ingestion-files")
 async def process_ingestion_files(ingestion_zip: UploadFile = File(...)):
     """Process zip file containing ingestion YAML files and generate
     read YAML files"""
-    if not ingestion_zip.filename.endswith('.zip'):
+    if not has_extension(ingestion_zip.filename, ZIP_EXTENSIONS):
         raise HTTPException(
             status_code=400,
             detail="Invalid file type. Please upload a .zip file"
         )
 
     try:
-        # Read the uploaded zip file
-        content = await ingestion_zip.read()
-        input_zip_buffer = io.BytesIO(content)
-
         try:
-            # Process the files and store them in memory
-            processed_files = []
-
-            with zipfile.ZipFile(input_zip_buffer, 'r') as input_zip:
-                # Check for valid YAML files
-                yaml_files = [
-                    f for f in input_zip.namelist()
-                    if f.endswith(('.yaml', '.yml'))
-                ]
-
-                if not yaml_files:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="No YAML files found in the zip file"
-                    )
-
-                for yaml_file in yaml_files:
-                    # Read the ingestion YAML
-                    ingestion_yaml = input_zip.read(yaml_file).decode('utf-8')
+            # Open the spooled upload in place, in a worker thread
+            input_zip, yaml_files = await asyncio.to_thread(
+                open_zip_yamls, ingestion_zip.file
+            )
 
-                    # Convert ingestion YAML to read YAML
-                    read_yaml = parser.convert_ingestion_to_read_yaml(
-                        ingestion_yaml
-                    )
+            # Check for valid YAML files
+            if not yaml_files:
+                input_zip.close()
+                raise HTTPException(
+                    status_code=400,
+                    detail="No YAML files found in the zip file"
+                )
 
-                    # Generate the output filename
-                    base_name = os.path.splitext(
-                        os.path.basename(yaml_file)
-                    )[0]
-                    read_filename = f"{base_name}_read.yaml"
-
-                    # Store the processed file information
-                    processed_files.append({
-                        "filename": read_filename,
-                        "content": read_yaml
-                    })
-
-            # Return a JSON response with all processed files
-            return JSONResponse(content={
-                "message": f"Successfully processed {len(processed_files)} "
-                          "files",
-                "files": processed_files
-            })
+            async def convert_members() -> AsyncIterator[dict]:
+                try:
+                    for yaml_file in yaml_files:
+                        # Read the ingestion YAML
+                        data = await asyncio.to_thread(
+                            input_zip.read, yaml_file
+                        )
+
+                        # Convert ingestion YAML to read YAML
+                        read_yaml = await asyncio.to_thread(
+                            parser.convert_ingestion_to_read_yaml,
+                            data.decode('utf-8')
+                        )
+                        yield {
+                            "filename": read_yaml_filename(yaml_file),
+                            "content": read_yaml
+                        }
+                finally:
+                    input_zip.close()
+
+            # Stream the processed files as they are converted
+            return await files_json_response(convert_members())
 
         except zipfile.BadZipFile:
             # If the input can't be read as a ZIP file, return an error
@@ -360,58 +891,52 @@ async def process_multiple_files(
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
 
-    processed_files = []
-
-    for file in files:
-        if not file.filename.endswith(('.yaml', '.yml')):
-            continue  # Skip non-YAML files
+    async def convert_uploads() -> AsyncIterator[dict]:
+        for file in files:
+            if not has_extension(file.filename, YAML_EXTENSIONS):
+                continue  # Skip non-YAML files
 
-        try:
-            # Read the uploaded YAML file
-            content = await file.read()
-            ingestion_yaml = content.decode('utf-8')
-
-            # Convert ingestion YAML to read YAML
-            read_yaml = parser.convert_ingestion_to_read_yaml(ingestion_yaml)
+            try:
+                # Read the uploaded YAML file
+                ingestion_yaml = await read_upload_text(file)
 
-            # Generate the output filename
-            base_name = os.path.splitext(
-                os.path.basename(file.filename)
-            )[0]
-            read_filename = f"{base_name}_read.yaml"
+                # Convert ingestion YAML to read YAML, off the event loop
+                read_yaml = await asyncio.to_thread(
+                    parser.convert_ingestion_to_read_yaml, ingestion_yaml
+                )
+            except Exception as e:
+                # Log the error but continue processing other files
+                logger.error(
+                    f"Error processing file {file.filename}: {str(e)}"
+                )
+                continue
 
-            # Store the processed file information
-            processed_files.append({
-                "filename": read_filename,
+            yield {
+                "filename": read_yaml_filename(file.filename),
                 "content": read_yaml
-            })
-        except Exception as e:
-            # Log the error but continue processing other files
-            logger.error(
-                f"Error processing file {file.filename}: {str(e)}"
-            )
+            }
 
-    if not processed_files:
+    # Stream the processed files as they are converted
+    response = await files_json_response(convert_uploads())
+    if response is None:
         raise HTTPException(
             status_code=400,
             detail="No valid YAML files were processed"
         )
-
-    # Return a JSON response with all processed files
-    return JSONResponse(content={
-        "message": f"Successfully processed {len(processed_files)} files",
-        "files": processed_files
-    })
+    return response
 
 
 @app.get("/api/generate-yaml-single")
 async def generate_yaml_single_get(
     table_name: str = Query(..., description="Table name to generate YAML"),
-    schema_json: Optional[str] = Query(None, description="Schema JSON data")
+    schema_json: Optional[str] = Query(None, description="Schema JSON data"),
+    if_none_match: Optional[str] = Header(None)
 ):
     """Generate a single NoSQLBench YAML file for a specific table
     (GET method)"""
-    return await _generate_yaml_single(table_name, schema_json)
+    return await _generate_yaml_single(
+        table_name, schema_json, if_none_match=if_none_match, cacheable=True
+    )
 
 
 @app.post("/api/generate-yaml-single")
@@ -424,11 +949,40 @@ async def generate_yaml_single_post(
     return await _generate_yaml_single(table_name, schema_json)
 
 
+# How long browsers may reuse a generated YAML from the GET endpoint
+# without revalidating it, when schema_json in the URL pins the schema
+YAML_MAX_AGE_SECONDS = 300
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match request header against an ETag.
+
+    Args:
+        if_none_match (Optional[str]): The header value, if any
+        etag (str): The quoted entity tag of the current response
+
+    Returns:
+        bool: True if the client's cached copy is still current
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+
 async def _generate_yaml_single(
-    table_name: str, schema_json: Optional[str] = None
+    table_name: str,
+    schema_json: Optional[str] = None,
+    if_none_match: Optional[str] = None,
+    cacheable: bool = False
 ):
     """Internal function to handle YAML generation for both GET and
-    POST methods"""
+    POST methods
+
+    With cacheable set, the response carries an ETag derived from the
+    schema and table, and a request whose If-None-Match already names
+    it gets a 304 without the YAML being generated."""
     try:
         # Validate required parameters
         if not table_name:
@@ -437,25 +991,45 @@ async def _generate_yaml_single(
                 detail="Missing required parameter: table_name"
             )
 
-        schema_info = None
-
-        # If schema_json is provided, use it
+        # If schema_json is provided, use it. The UI usually sends back
+        # a schema stored earlier; reuse the parsed copy rather than
+        # decoding the JSON again.
         if schema_json:
-            schema_info = json.loads(schema_json)
-        # Otherwise, try to get it from the cache
-        elif 'latest' in SCHEMA_CACHE:
-            schema_info = SCHEMA_CACHE['latest']
-        # If not available anywhere, return an error
+            key = schema_hash(schema_json)
+            schema_info = get_stored_schema(key)
+        # Otherwise, try to get the latest one from the cache
         else:
-            raise HTTPException(
-                status_code=400,
-                detail="Schema information not available. Please upload a "
-                      "schema first or provide schema_json."
+            key = _latest_schema_key
+            schema_info = get_stored_schema(key)
+            # If not available anywhere, return an error
+            if schema_info is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Schema information not available. Please "
+                          "upload a schema first or provide schema_json."
+                )
+
+        cache_headers = {}
+        if cacheable:
+            etag = '"%s"' % hashlib.blake2b(
+                key + table_name.encode('utf-8'), digest_size=16
+            ).hexdigest()
+            # Without schema_json the same URL serves whichever schema
+            # was stored last, so the browser must revalidate each time
+            cache_control = (
+                f"private, max-age={YAML_MAX_AGE_SECONDS}" if schema_json
+                else "private, no-cache"
             )
+            cache_headers = {"ETag": etag, "Cache-Control": cache_control}
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers=cache_headers)
+
+        if schema_info is None:
+            schema_info = orjson.loads(schema_json)
 
         # Generate the YAML content
-        yaml_content = parser.generate_nosqlbench_yaml(
-            schema_info, table_name
+        yaml_content = await asyncio.to_thread(
+            get_schema_yaml, schema_info, key, table_name
         )
 
         # Clean the table name for the filename
@@ -463,12 +1037,11 @@ async def _generate_yaml_single(
         filename = f"{safe_name}.yaml"
 
         # Return the YAML content directly as plain text
-        return StreamingResponse(
-            io.StringIO(yaml_content),
-            media_type="text/plain",
+        return PlainTextResponse(
+            yaml_content,
             headers={
                 "Content-Disposition": f"attachment; filename={filename}",
-                "Content-Type": "text/plain; charset=utf-8"
+                **cache_headers
             }
         )
     except Exception as e:
@@ -485,7 +1058,7 @@ async def process_ingestion_file(
     )
 ):
     """Process a single ingestion YAML file and generate a read YAML file"""
-    if not ingestion_file.filename.endswith(('.yaml', '.yml')):
+    if not has_extension(ingestion_file.filename, YAML_EXTENSIONS):
         raise HTTPException(
             status_code=400,
             detail="Invalid file type. Please upload a .yaml or .yml file"
@@ -493,11 +1066,12 @@ async def process_ingestion_file(
 
     try:
         # Read the uploaded YAML file
-        content = await ingestion_file.read()
-        ingestion_yaml = content.decode('utf-8')
+        ingestion_yaml = await read_upload_text(ingestion_file)
 
         # Convert ingestion YAML to read YAML
-        read_yaml = parser.convert_ingestion_to_read_yaml(ingestion_yaml)
+        read_yaml = await asyncio.to_thread(
+            parser.convert_ingestion_to_read_yaml, ingestion_yaml
+        )
 
         # Generate the output filename
         base_name = os.path.splitext(
@@ -506,12 +1080,10 @@ async def process_ingestion_file(
         read_filename = f"{base_name}_read.yaml"
 
         # Return the YAML content directly as plain text
-        return StreamingResponse(
-            io.StringIO(read_yaml),
-            media_type="text/plain",
+        return PlainTextResponse(
+            read_yaml,
             headers={
-                "Content-Disposition": f"attachment; filename={read_filename}",
-                "Content-Type": "text/plain; charset=utf-8"
+                "Content-Disposition": f"attachment; filename={read_filename}"
             }
         )
     except Exception as e:
@@ -533,7 +1105,7 @@ async def generate_read_yaml(
 ):
     """Generate a read YAML file from a write YAML file, DSBulk CSV path,
     and primary key columns"""
-    if not write_yaml_file.filename.endswith(('.yaml', '.yml')):
+    if not has_extension(write_yaml_file.filename, YAML_EXTENSIONS):
         raise HTTPException(
             status_code=400,
             detail="Invalid write YAML file type. Please upload a "
@@ -542,8 +1114,7 @@ async def generate_read_yaml(
 
     try:
         # Read the uploaded YAML file
-        content = await write_yaml_file.read()
-        write_yaml = content.decode('utf-8')
+        write_yaml = await read_upload_text(write_yaml_file)
 
         # Parse primary key columns
         pk_columns = [
@@ -557,7 +1128,8 @@ async def generate_read_yaml(
             )
 
         # Generate read YAML
-        read_yaml = parser.generate_read_yaml_from_write_and_csv(
+        read_yaml = await asyncio.to_thread(
+            parser.generate_read_yaml_from_write_and_csv,
             write_yaml, csv_path, pk_columns
         )
 
@@ -568,12 +1140,10 @@ async def generate_read_yaml(
         read_filename = f"{base_name}_read.yaml"
 
         # Return the YAML content directly as plain text
-        return StreamingResponse(
-            io.StringIO(read_yaml),
-            media_type="text/plain",
+        return PlainTextResponse(
+            read_yaml,
             headers={
-                "Content-Disposition": f"attachment; filename={read_filename}",
-                "Content-Type": "text/plain; charset=utf-8"
+                "Content-Disposition": f"attachment; filename={read_filename}"
             }
         )
     except Exception as e:
@@ -594,7 +1164,7 @@ async def generate_read_yaml_json(
     )
 ):
     """Generate a read YAML file and return as JSON response"""
-    if not write_yaml_file.filename.endswith(('.yaml', '.yml')):
+    if not has_extension(write_yaml_file.filename, YAML_EXTENSIONS):
         raise HTTPException(
             status_code=400,
             detail="Invalid write YAML file type. Please upload a "
@@ -603,8 +1173,7 @@ async def generate_read_yaml_json(
 
     try:
         # Read the uploaded YAML file
-        content = await write_yaml_file.read()
-        write_yaml = content.decode('utf-8')
+        write_yaml = await read_upload_text(write_yaml_file)
 
         # Parse primary key columns
         pk_columns = [
@@ -618,7 +1187,8 @@ async def generate_read_yaml_json(
             )
 
         # Generate read YAML
-        read_yaml = parser.generate_read_yaml_from_write_and_csv(
+        read_yaml = await asyncio.to_thread(
+            parser.generate_read_yaml_from_write_and_csv,
             write_yaml, csv_path, pk_columns
         )
 
@@ -629,7 +1199,7 @@ async def generate_read_yaml_json(
         read_filename = f"{base_name}_read.yaml"
 
         # Return JSON response with the generated content
-        return JSONResponse(content={
+        return ORJSONResponse(content={
             "message": "Successfully generated read YAML file",
             "filename": read_filename,
             "content": read_yaml,
@@ -684,7 +1254,8 @@ async def generate_dsbulk_commands(
                     detail="Output path is required for unload operations"
                 )
 
-            command = dsbulk_manager.generate_unload_command(
+            command = await asyncio.to_thread(
+                dsbulk_manager.generate_unload_command,
                 keyspace=keyspace,
                 table=table,
                 primary_key=primary_key,
@@ -693,7 +1264,7 @@ async def generate_dsbulk_commands(
             )
 
             return {
-                "command": command,
+                "command": dsbulk_manager.format_command(command),
                 "operation": operation,
                 "description": (
                     f"Exports {primary_key} values from {keyspace}.{table} "
@@ -708,14 +1279,15 @@ async def generate_dsbulk_commands(
                     detail="CSV path is required for load operations"
                 )
 
-            command = dsbulk_manager.generate_load_command(
+            command = await asyncio.to_thread(
+                dsbulk_manager.generate_load_command,
                 keyspace=keyspace,
                 table=table,
                 csv_path=csv_path
             )
 
             return {
-                "command": command,
+                "command": dsbulk_manager.format_command(command),
                 "operation": operation,
                 "description": (
                     f"Imports data from {csv_path} into {keyspace}.{table}"
@@ -723,13 +1295,14 @@ async def generate_dsbulk_commands(
             }
 
         elif operation == "count":
-            command = dsbulk_manager.generate_count_command(
+            command = await asyncio.to_thread(
+                dsbulk_manager.generate_count_command,
                 keyspace=keyspace,
                 table=table
             )
 
             return {
-                "command": command,
+                "command": dsbulk_manager.format_command(command),
                 "operation": operation,
                 "description": f"Counts rows in {keyspace}.{table}"
             }
@@ -740,6 +1313,9 @@ async def generate_dsbulk_commands(
                 detail=f"Unsupported operation: {operation}"
             )
 
+    except ValueError as e:
+        # Keyspace, table or column not in the cluster's schema
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -752,19 +1328,32 @@ async def execute_dsbulk_command(
     command: str = Form(..., description="DSBulk command to execute"),
     save_output: bool = Form(
         False, description="Whether to save command output to a file"
+    ),
+    timeout: Optional[float] = Form(
+        None, description="Seconds before the command is killed"
     )
 ):
     """Execute a DSBulk command and return the result"""
 
-    # Security check - very basic, additional validation recommended
-    if ";" in command or "&" in command or "|" in command:
+    # The command runs without a shell, so only check that it is a
+    # DSBulk invocation rather than an arbitrary program
+    try:
+        argv = dsbulk_manager.parse_command(command)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid command: {str(e)}"
+        )
+    if not dsbulk_manager.is_dsbulk_command(argv):
         raise HTTPException(
             status_code=400,
-            detail="Invalid command: contains disallowed characters"
+            detail="Invalid command: expected a DSBulk command"
         )
 
     try:
-        result = dsbulk_manager.execute_command(command)
+        result = await dsbulk_manager.execute_command(
+            argv, timeout=timeout
+        )
 
         if save_output and result["success"]:
             # Save output to a temporary file
@@ -797,7 +1386,8 @@ async def download_dsbulk_script(
 
     try:
         # Generate the command
-        command = dsbulk_manager.generate_unload_command(
+        command = await asyncio.to_thread(
+            dsbulk_manager.generate_unload_command,
             keyspace=keyspace,
             table=table,
             primary_key=primary_key,
@@ -806,24 +1396,19 @@ async def download_dsbulk_script(
         )
 
         # Create a shell script with the command
-        script_content = "#!/bin/bash\n\n"
-        script_content += (
-            "# DSBulk unload script generated by NoSQLBench "
-            "Schema Generator\n"
+        script_content = shell_script(
+            DSBULK_SCRIPT_HEADER,
+            f"Exports data from {keyspace}.{table}",
+            dsbulk_manager.format_command(command)
         )
-        script_content += f"# Exports data from {keyspace}.{table}\n\n"
-        script_content += command
-        script_content += "\n\n# End of script\n"
 
         # Return the script for download
         filename = f"dsbulk_unload_{keyspace}_{table}.sh"
 
-        return StreamingResponse(
-            io.StringIO(script_content),
-            media_type="text/plain",
+        return PlainTextResponse(
+            script_content,
             headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "Content-Type": "text/plain; charset=utf-8"
+                "Content-Disposition": f"attachment; filename={filename}"
             }
         )
 
@@ -970,25 +1555,20 @@ async def download_nb5_script(
         )
 
         # Create a shell script with the command
-        script_content = "#!/bin/bash\n\n"
-        script_content += (
-            "# NoSQLBench 5 execution script generated by NoSQLBench "
-            "Schema Generator\n"
+        script_content = shell_script(
+            NB5_SCRIPT_HEADER,
+            f"Executes workload against {host}",
+            command
         )
-        script_content += f"# Executes workload against {host}\n\n"
-        script_content += command
-        script_content += "\n\n# End of script\n"
 
         # Return the script for download
         yaml_file_basename = os.path.basename(yaml_file)
         filename = f"nb5_execute_{yaml_file_basename}.sh"
 
-        return StreamingResponse(
-            io.StringIO(script_content),
-            media_type="text/plain",
+        return PlainTextResponse(
+            script_content,
             headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "Content-Type": "text/plain; charset=utf-8"
+                "Content-Disposition": f"attachment; filename={filename}"
             }
         )
 
@@ -1004,12 +1584,16 @@ async def download_nb5_script(
 async def validate_cqlgen():
     """Validate that the CQL Generator is available and Java is installed"""
     try:
-        # Check if Java is available
-        java_available = cql_generator._verify_java_version()
+        # Check if Java is available. The result is cached for the life
+        # of the process, so only the first call spawns `java`, and that
+        # one runs off the event loop.
+        java_available = await asyncio.to_thread(
+            cql_generator._verify_java_version
+        )
 
         return {
             "valid": java_available,
-            "nb5_jar_exists": os.path.exists(cql_generator.NB5_JAR_PATH),
+            "nb5_jar_exists": NB5_JAR_PATH.exists(),
             "java_version": ("Java 17+" if java_available else
                            "Java 17+ not found")
         }
@@ -1021,15 +1605,28 @@ async def validate_cqlgen():
 
 
 @app.get("/api/cqlgen/download/{session_id}/{filename}")
-async def download_cqlgen_file(session_id: str, filename: str):
+async def download_cqlgen_file(
+    session_id: str,
+    filename: str
+):
     """Download a generated file from a CQLGen session"""
     file_path = SESSIONS_DIR / session_id / filename
 
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
 
-    # Provide the file directly
-    return FileResponse(
+    if USE_X_ACCEL:
+        location = quote(f"{X_ACCEL_SESSIONS_LOCATION}{session_id}/{filename}")
+        return Response(
+            media_type="application/octet-stream",
+            headers={
+                "X-Accel-Redirect": location,
+                "Content-Disposition": f"attachment; filename={filename}"
+            }
+        )
+
+    # Provide the file directly, zero-copy where the server allows
+    return ZeroCopyFileResponse(
         path=file_path,
         filename=filename,
         media_type="application/octet-stream"
@@ -1038,21 +1635,20 @@ async def download_cqlgen_file(session_id: str, filename: str):
 
 @app.post("/api/cqlgen/generate")
 async def generate_cqlgen_yaml(
-    background_tasks: BackgroundTasks,
     schema_file: UploadFile = File(..., description="CQL schema file"),
     conf_file: Optional[UploadFile] = File(
         None, description="Configuration file (optional)"
     )
 ):
     """Generate a YAML file from a CQL schema file using nb5.jar cqlgen"""
-    if not schema_file.filename.endswith(('.cql', '.txt')):
+    if not has_extension(schema_file.filename, CQL_EXTENSIONS):
         raise HTTPException(
             status_code=400,
             detail="Invalid file type. Please upload a .cql or .txt file"
         )
 
     try:
-        # Create a session
+        # Create a session; the periodic sweep removes it once expired
         session_id = cql_generator.create_session()
         session_dir = SESSIONS_DIR / session_id
 
@@ -1060,30 +1656,21 @@ async def generate_cqlgen_yaml(
         schema_path = session_dir / schema_file.filename
         output_file = "output.yaml"
 
-        # Save the uploaded schema file
-        schema_content = await schema_file.read()
-        with open(schema_path, "wb") as f:
-            f.write(schema_content)
-
-        # Handle conf file if provided
-        conf_path = None
-        if conf_file:
-            conf_path = session_dir / conf_file.filename
-            conf_content = await conf_file.read()
-            with open(conf_path, "wb") as f:
-                f.write(conf_content)
+        # Stream the schema file, and the conf file if provided, to
+        # the session directory
+        conf_path = session_dir / conf_file.filename if conf_file else None
+        await save_uploads(schema_file, schema_path, conf_file, conf_path)
 
         # Process the files
-        success, message, output_path = cql_generator.process_files(
-            str(schema_path),
-            output_file,
-            str(conf_path) if conf_path else None,
-            session_id
+        success, message, output_path = (
+            await cql_generator.process_files_async(
+                str(schema_path),
+                output_file,
+                str(conf_path) if conf_path else None,
+                session_id
+            )
         )
 
-        # Clean up nb5.jar after processing
-        background_tasks.add_task(cql_generator.remove_nb5_jar, session_id)
-
         if not success:
             raise HTTPException(status_code=500, detail=message)
 
@@ -1095,16 +1682,12 @@ async def generate_cqlgen_yaml(
         }
 
     except Exception as e:
-        # Only delete nb5.jar, not the whole session if it exists
-        if 'session_id' in locals():
-            background_tasks.add_task(cql_generator.remove_nb5_jar, session_id)
         error_msg = f"Error processing file: {str(e)}"
         raise HTTPException(status_code=500, detail=error_msg)
 
 
 @app.post("/api/cqlgen/process-with-schema")
 async def process_with_schema(
-    background_tasks: BackgroundTasks,
     schema_file: UploadFile = File(..., description="CQL schema file"),
     conf_file: Optional[UploadFile] = File(
         None, description="Configuration file (optional)"
@@ -1117,14 +1700,14 @@ async def process_with_schema(
 ):
     """Generate a YAML file from a CQL schema file and optionally parse it
     for use in the app"""
-    if not schema_file.filename.endswith(('.cql', '.txt')):
+    if not has_extension(schema_file.filename, CQL_EXTENSIONS):
         raise HTTPException(
             status_code=400,
             detail="Invalid file type. Please upload a .cql or .txt file"
         )
 
     try:
-        # Create a session
+        # Create a session; the periodic sweep removes it once expired
         session_id = cql_generator.create_session()
         session_dir = SESSIONS_DIR / session_id
 
@@ -1132,30 +1715,24 @@ async def process_with_schema(
         schema_path = session_dir / schema_file.filename
         output_file = "output.yaml"
 
-        # Read and save the schema content
-        schema_content = await schema_file.read()
-        with open(schema_path, "wb") as f:
-            f.write(schema_content)
-
-        # Handle conf file if provided
-        conf_path = None
-        if conf_file:
-            conf_path = session_dir / conf_file.filename
-            conf_content = await conf_file.read()
-            with open(conf_path, "wb") as f:
-                f.write(conf_content)
+        # Stream the schema file, and the conf file if provided, to
+        # the session directory
+        conf_path = session_dir / conf_file.filename if conf_file else None
+        saved_text = await save_uploads(
+            schema_file, schema_path, conf_file, conf_path,
+            decode_schema=parse_for_app
+        )
 
         # Process the file with CQL Generator
-        success, message, output_path = cql_generator.process_files(
-            str(schema_path),
-            output_file,
-            str(conf_path) if conf_path else None,
-            session_id
+        success, message, output_path = (
+            await cql_generator.process_files_async(
+                str(schema_path),
+                output_file,
+                str(conf_path) if conf_path else None,
+                session_id
+            )
         )
 
-        # Clean up nb5.jar after processing
-        background_tasks.add_task(cql_generator.remove_nb5_jar, session_id)
-
         if not success:
             raise HTTPException(status_code=500, detail=message)
 
@@ -1169,18 +1746,25 @@ async def process_with_schema(
         # If requested, also parse the schema for the application
         if parse_for_app:
             try:
-                # Use the schema content we already have
-                schema_text = schema_content.decode('utf-8')
+                # Use the text decoded while saving; if that failed,
+                # reading the file again raises the decoding error
+                schema_text = saved_text
+                if schema_text is None:
+                    schema_text = await asyncio.to_thread(
+                        schema_path.read_text, encoding='utf-8'
+                    )
 
                 # Parse the schema
-                schema_info = parser.parse_cql(schema_text)
+                key, parsed = await asyncio.to_thread(
+                    get_parsed_schema, schema_text
+                )
 
                 # Store in cache for later use
-                SCHEMA_CACHE['latest'] = schema_info
+                set_latest_schema(parsed.info, key)
 
                 # Add schema information to the result
-                result["schema_info"] = schema_info
-                result["tables"] = list(schema_info["tables"].keys())
+                result["schema_info"] = parsed.info
+                result["tables"] = parsed.tables
             except Exception as e:
                 # If parsing fails, still return the YAML generation result
                 # but include the parsing error
@@ -1189,9 +1773,6 @@ async def process_with_schema(
         return result
 
     except Exception as e:
-        # Only delete nb5.jar, not the whole session if it exists
-        if 'session_id' in locals():
-            background_tasks.add_task(cql_generator.remove_nb5_jar, session_id)
         error_msg = f"Error processing file: {str(e)}"
         raise HTTPException(status_code=500, detail=error_msg)
 
@@ -7,6 +7,7 @@ for the application to use.
 """
 
 import os
+import shutil
 import requests
 from pathlib import Path
 import logging
@@ -24,6 +25,7 @@ NB5_RELEASE_URL = (
     "https://github.com/nosqlbench/nosqlbench/releases/"
     "latest/download/nb5.jar"
 )
+DOWNLOAD_CHUNK_SIZE = 1 << 20
 
 
 def ensure_nb5_jar(target_path=None):
@@ -87,10 +89,10 @@ def download_nb5_jar(target_path):
         response = requests.get(NB5_RELEASE_URL, stream=True)
         response.raise_for_status()  # Raise an exception for HTTP errors
 
-        # Save the file
-        with open(target_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        # Save the file, copying from the socket in large blocks
+        response.raw.decode_content = True
+        with response, open(target_path, 'wb') as f:
+            shutil.copyfileobj(response.raw, f, DOWNLOAD_CHUNK_SIZE)
 
         logger.info(f"Successfully downloaded nb5.jar to {target_path}")
         return True